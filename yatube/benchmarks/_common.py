@@ -0,0 +1,98 @@
+"""Общие помощники для замеров производительности.
+
+Скрипты запускаются из каталога ``yatube/``::
+
+    python -m benchmarks.pagination --posts 100000
+
+Каждый замер поднимает отдельную тестовую базу, поэтому рабочая
+``db.sqlite3`` не затрагивается.
+"""
+import argparse
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+
+
+def parser(description, **defaults):
+    arguments = argparse.ArgumentParser(description=description)
+    for name, default in defaults.items():
+        arguments.add_argument('--' + name.replace('_', '-'),
+                               type=type(default), default=default)
+    return arguments
+
+
+@contextmanager
+def test_database(name=None):
+    """Тестовая база на время замера; name — путь к файлу SQLite вместо
+    базы в памяти, например чтобы открыть её из нескольких процессов."""
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=5):
+    """Медиана времени выполнения func() в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def seed_posts(count, authors=1, groups=1, batch_size=5000, text=None):
+    """Создаёт count постов, распределённых по авторам и группам;
+    text(num) — текст поста, по умолчанию «Пост num»."""
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Group, Post
+
+    User = get_user_model()
+    users = User.objects.bulk_create([
+        User(username=f'bench-user-{num}') for num in range(authors)
+    ])
+    users = list(User.objects.filter(
+        username__in=[user.username for user in users]))
+    group_list = Group.objects.bulk_create([
+        Group(title=f'Группа {num}', slug=f'bench-group-{num}')
+        for num in range(groups)
+    ])
+    group_list = list(Group.objects.filter(
+        slug__in=[group.slug for group in group_list]))
+    for start in range(0, count, batch_size):
+        Post.objects.bulk_create([
+            Post(text=text(num) if text else f'Пост {num}',
+                 author=users[num % len(users)],
+                 group=group_list[num % len(group_list)])
+            for num in range(start, min(start + batch_size, count))
+        ])
+    return users, group_list
+
+
+def print_table(header, rows):
+    widths = [
+        max(len(str(cell)) for cell in column)
+        for column in zip(header, *rows)
+    ]
+    for row in [header] + rows:
+        print('  '.join(str(cell).rjust(width)
+                        for cell, width in zip(row, widths)))
@@ -0,0 +1,43 @@
+"""Размер и время разбора закэшированной страницы ленты: pickle моделей,
+pickle карточек и упакованный формат posts.cards.pack."""
+import pickle
+
+from ._common import (measure, parser, print_table, seed_posts, setup,
+                      test_database)
+
+
+def main():
+    options = parser(__doc__, posts=1000, per_page=10, text_length=280,
+                     repeat=200).parse_args()
+    setup()
+
+    from posts.cards import FeedQuery, pack, unpack
+    from posts.models import Post
+
+    with test_database():
+        seed_posts(options.posts, authors=10, groups=5)
+        Post.objects.update(text='т' * options.text_length)
+        stop = options.per_page
+        models = list(Post.objects.select_related('author', 'group')[:stop])
+        cards = FeedQuery(Post.objects.all())[:stop]
+        variants = (
+            ('pickle(Post)', pickle.dumps(models), pickle.loads),
+            ('pickle(FeedCard)', pickle.dumps(cards), pickle.loads),
+            ('pack', pickle.dumps(pack(cards)),
+             lambda data: unpack(pickle.loads(data))),
+        )
+        rows = []
+        for name, data, load in variants:
+            decode_ms = measure(lambda: load(data), options.repeat)
+            rows.append((
+                name,
+                len(data) // options.per_page,
+                f'{decode_ms * 1000 / options.per_page:.1f}',
+            ))
+        print(f'Страница из {options.per_page} карточек, текст '
+              f'{options.text_length} символов, запись кэша в pickle')
+        print_table(('format', 'bytes/card', 'decode, us/card'), rows)
+
+
+if __name__ == '__main__':
+    main()
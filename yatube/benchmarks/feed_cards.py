@@ -0,0 +1,81 @@
+"""Память и объём строк страницы ленты: модели против карточек."""
+import tracemalloc
+
+from ._common import (measure, parser, print_table, seed_posts, setup,
+                      test_database)
+
+
+def result_bytes(connection, queryset):
+    """Сколько байт значений колонок возвращает запрос страницы."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    total = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, str):
+                total += len(value.encode())
+            elif isinstance(value, bytes):
+                total += len(value)
+            elif value is not None:
+                total += 8
+    return total
+
+
+def peak_memory(func):
+    """Пиковый прирост памяти Python за вызов func(), в КиБ."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    options = parser(__doc__, posts=10_000, per_page=10, page=50,
+                     repeat=20).parse_args()
+    setup()
+
+    from django.contrib.auth import get_user_model
+
+    from posts.cards import CARD_VALUES, FeedQuery
+    from posts.models import Group, Post
+
+    with test_database() as connection:
+        seed_posts(options.posts, authors=100, groups=10)
+        # У настоящих пользователей есть хэш пароля и почта, у групп
+        # описание; без них разница в объёме строк была бы занижена.
+        get_user_model().objects.update(
+            password='pbkdf2_sha256$150000$' + 'x' * 66,
+            email='author@example.com')
+        Group.objects.update(description='д' * 500)
+        start = (options.page - 1) * options.per_page
+        stop = start + options.per_page
+        models = Post.objects.select_related('author', 'group')
+        projected = models.only(*CARD_VALUES)
+        cards = FeedQuery(Post.objects.all())
+        variants = (
+            ('select_related', lambda: list(models[start:stop]),
+             models[start:stop]),
+            ('only()', lambda: list(projected[start:stop]),
+             projected[start:stop]),
+            ('FeedQuery', lambda: cards[start:stop],
+             cards._values()[start:stop]),
+        )
+        rows = []
+        for name, page, queryset in variants:
+            rows.append((
+                name,
+                f'{measure(page, options.repeat):.2f}',
+                f'{peak_memory(page):.1f}',
+                result_bytes(connection, queryset),
+            ))
+        print(f'{options.posts} постов, страница {options.page} '
+              f'по {options.per_page}')
+        print_table(('variant', 'ms', 'peak KiB', 'row bytes'), rows)
+
+
+if __name__ == '__main__':
+    main()
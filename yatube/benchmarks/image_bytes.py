@@ -0,0 +1,141 @@
+"""Байты картинок одной страницы ленты: миниатюра 960 пикселей в JPEG,
+которую карточка выводила раньше, против вариантов ``posts.images``,
+выбранных по ``srcset`` и ``sizes`` карточки.
+
+Картинки — синтетические фотографии (градиент, пятна и шум) в JPEG, как
+загрузки с телефона, или файлы из каталога ``--images``. На шуме WebP
+выигрывает у JPEG больше, чем на живых снимках, поэтому долю экономии
+стоит проверить на своих загрузках. Браузер берёт наименьший вариант не
+уже слота карточки в пикселях экрана, а если такого нет — самый широкий.
+"""
+import random
+import shutil
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from ._common import parser, print_table, setup, test_database
+
+# Ширина окна в CSS-пикселях и плотность пикселей экрана.
+DEVICES = (
+    ('телефон 1x', 360, 1),
+    ('телефон', 360, 2),
+    ('телефон 3x', 412, 3),
+    ('планшет', 768, 2),
+    ('ноутбук', 1280, 1),
+    ('ноутбук 2x', 1440, 2),
+)
+
+
+def slot_width(viewport):
+    # sizes="(min-width: 992px) 960px, 100vw" в post_include.html.
+    return 960 if viewport >= 992 else viewport
+
+
+def photo(width, height, seed):
+    from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+    randomizer = random.Random(seed)
+    channels = [
+        Image.linear_gradient('L').rotate(randomizer.randrange(360))
+        .resize((width, height))
+        for _ in range(3)
+    ]
+    image = Image.merge('RGB', channels)
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        left = randomizer.randrange(width)
+        top = randomizer.randrange(height)
+        size = randomizer.randrange(width // 20, width // 4)
+        color = tuple(randomizer.randrange(256) for _ in range(3))
+        draw.ellipse((left, top, left + size, top + size), fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(width // 200))
+    noise = Image.effect_noise((width, height), 3).convert('RGB')
+    return ImageChops.add(image, noise, offset=-128)
+
+
+def candidates(srcset, sizes):
+    """[(ширина, байты)] вариантов из srcset по возрастанию ширины."""
+    found = []
+    for candidate in srcset.split(', '):
+        url, width = candidate.split()
+        found.append((int(width[:-1]), sizes[url]))
+    return sorted(found)
+
+
+def choose(variants, needed):
+    for width, size in variants:
+        if width >= needed:
+            return size
+    return variants[-1][1]
+
+
+def uploads(options):
+    """Содержимое JPEG-картинок одной страницы."""
+    if options.images:
+        paths = sorted(Path(options.images).glob('*.jp*g'))[:options.page]
+        return [path.read_bytes() for path in paths]
+    contents = []
+    for num in range(options.page):
+        data = BytesIO()
+        photo(options.width, options.height, num).save(
+            data, 'JPEG', quality=90)
+        contents.append(data.getvalue())
+    return contents
+
+
+def main():
+    options = parser(__doc__, page=10, width=3000, height=2000,
+                     images='').parse_args()
+    setup()
+
+    from django.conf import settings
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.test import override_settings
+
+    from posts import images
+
+    media_root = tempfile.mkdtemp()
+
+    def size(url):
+        return default_storage.size(url[len(settings.MEDIA_URL):])
+
+    try:
+        with test_database(), override_settings(MEDIA_ROOT=media_root):
+            originals = 0
+            legacy = []
+            sources, webps = [], []
+            for num, content in enumerate(uploads(options)):
+                name = default_storage.save(f'posts/photo{num}.jpg',
+                                            ContentFile(content))
+                originals += default_storage.size(name)
+                legacy.append(size(images.card_thumbnail(name)[0]))
+                fields = images.thumbnail_fields(name)
+                urls = [candidate.split()[0] for field in (
+                    'thumbnail_srcset', 'thumbnail_webp_srcset')
+                    for candidate in fields[field].split(', ')]
+                sizes = {url: size(url) for url in urls}
+                sources.append(candidates(fields['thumbnail_srcset'], sizes))
+                webps.append(candidates(fields['thumbnail_webp_srcset'],
+                                        sizes))
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    before = sum(legacy)
+    rows = []
+    for device, viewport, density in DEVICES:
+        needed = slot_width(viewport) * density
+        source = sum(choose(variants, needed) for variants in sources)
+        webp = sum(choose(variants, needed) for variants in webps)
+        rows.append((device, f'{viewport}@{density}x', f'{before / 1024:.0f}',
+                     f'{source / 1024:.0f}', f'{webp / 1024:.0f}',
+                     f'{1 - webp / before:.0%}'))
+    print(f'{len(legacy)} картинок на странице, '
+          f'оригиналы {originals / 1024:.0f} KiB')
+    print_table(('device', 'viewport', 'jpeg 960, KiB', 'srcset jpeg, KiB',
+                 'srcset webp, KiB', 'saved'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Сравнение OFFSET-пагинации и курсоров на глубоких страницах ленты."""
+from ._common import (measure, parser, print_table, seed_posts, setup,
+                      test_database)
+
+
+def main():
+    options = parser(__doc__, posts=100_000, per_page=10,
+                     repeat=5).parse_args()
+    setup()
+
+    from django.core.paginator import Paginator
+
+    from posts.models import Post
+    from posts.paginator import NEXT, CursorPaginator
+
+    with test_database():
+        seed_posts(options.posts)
+        post_list = Post.objects.select_related('author', 'group')
+        offset_paginator = Paginator(post_list, options.per_page)
+        cursor_paginator = CursorPaginator(post_list, options.per_page)
+        last_page = offset_paginator.num_pages
+        rows = []
+        for number in (1, 10, 100, 1000, 10_000, 100_000):
+            if number > last_page:
+                break
+            if number == 1:
+                cursor = None
+            else:
+                # Курсор берётся с последней записи предыдущей страницы,
+                # его поиск в замер не входит.
+                anchor = Post.objects.all()[
+                    (number - 1) * options.per_page - 1]
+                cursor = cursor_paginator.cursor_for(anchor, NEXT)
+            offset_ms = measure(
+                lambda: list(Paginator(post_list, options.per_page)
+                             .get_page(number)),
+                options.repeat)
+            cursor_ms = measure(
+                lambda: list(cursor_paginator.get_page(cursor)),
+                options.repeat)
+            rows.append((number, f'{offset_ms:.2f}', f'{cursor_ms:.2f}'))
+        print(f'{options.posts} постов, {options.per_page} на странице')
+        print_table(('page', 'offset, ms', 'cursor, ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Поиск по тексту постов: индекс FTS5 (posts.search) против
+``text__icontains``, первая страница результатов.
+
+Тексты — случайные слова со скошенным, как в живом языке, распределением
+частот. icontains находит первые посты частого слова быстро, потому что
+обходит ленту по дате и останавливается на первой странице, а на редком
+слове читает всю таблицу; ранжировать он не умеет, и регистр кириллицы
+в SQLite не приводит.
+"""
+import random
+from itertools import product
+
+from ._common import (measure, parser, print_table, seed_posts, setup,
+                      test_database)
+
+SYLLABLES = ('ка', 'ло', 'ми', 'ре', 'ту', 'са', 'но', 'ви', 'да', 'пе',
+             'ро', 'зу', 'ли', 'ма', 'те', 'го')
+
+
+def vocabulary(size):
+    words = [''.join(parts) for length in (2, 3)
+             for parts in product(SYLLABLES, repeat=length)]
+    return words[:size]
+
+
+def main():
+    options = parser(__doc__, posts=1_000_000, words=4000, per_page=10,
+                     repeat=5).parse_args()
+    setup()
+
+    from django.db import connection
+
+    from posts import search
+    from posts.models import Post
+
+    words = vocabulary(options.words)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    randomizer = random.Random(0)
+
+    def text(num):
+        return ' '.join(randomizer.choices(words, weights, k=12))
+
+    with test_database():
+        users, _ = seed_posts(options.posts, authors=100, groups=10,
+                              text=text)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        author_id = users[0].pk
+        cases = (
+            ('частое слово', words[0], None),
+            ('среднее слово', words[len(words) // 10], None),
+            ('редкое слово', words[-1], None),
+            ('два слова', f'{words[1]} {words[50]}', None),
+            ('редкое + автор', words[-1], author_id),
+        )
+        rows = []
+        for name, query, author in cases:
+            filters = {'author_id': author} if author else {}
+            terms = query.split()
+            icontains = Post.objects.filter(**filters)
+            for term in terms:
+                icontains = icontains.filter(text__icontains=term)
+            like_ms = measure(
+                lambda: list(icontains[:options.per_page]), options.repeat)
+            fts_ms = measure(
+                lambda: list(search.find(query, options.per_page,
+                                         author_id=author)),
+                options.repeat)
+            rows.append((name, query, f'{like_ms:.2f}', f'{fts_ms:.2f}'))
+    print(f'{options.posts} постов, {options.per_page} на странице')
+    print_table(('case', 'query', 'icontains, ms', 'fts5 + bm25, ms'),
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Кэш при нескольких процессах: LocMemCache, файлы и SQLiteCache.
+
+Процессы-воркеры читают общий набор ключей и при промахе кладут значение,
+как страницы и карточки в posts.caching, и через каждые несколько
+операций увеличивают общий счётчик. Доля попаданий показывает, видят ли
+процессы записи друг друга, итог счётчика — не теряются ли инкременты.
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from ._common import parser, print_table, setup
+
+BACKENDS = (
+    ('locmem', 'django.core.cache.backends.locmem.LocMemCache'),
+    ('file', 'django.core.cache.backends.filebased.FileBasedCache'),
+    ('sqlite', 'core.cache.SQLiteCache'),
+)
+COUNTER = 'bench:counter'
+INCR_EVERY = 10
+
+
+def create(backend, location, max_entries):
+    from django.utils.module_loading import import_string
+
+    return import_string(backend)(
+        location, {'OPTIONS': {'MAX_ENTRIES': max_entries}})
+
+
+def work(cache, options, seed, start, results):
+    rng = random.Random(seed)
+    value = 'x' * options.value_size
+    hits = 0
+    start.wait()
+    started = time.perf_counter()
+    for num in range(options.ops):
+        key = f'bench:{rng.randrange(options.keys)}'
+        if cache.get(key) is None:
+            cache.set(key, value)
+        else:
+            hits += 1
+        if num % INCR_EVERY == 0:
+            cache.incr(COUNTER)
+    results.put((hits, time.perf_counter() - started))
+
+
+def run(backend, location, options):
+    context = multiprocessing.get_context('fork')
+    cache = create(backend, location, options.keys * 2)
+    cache.clear()
+    cache.set(COUNTER, 0)
+    start = context.Barrier(options.workers)
+    results = context.Queue()
+    workers = [
+        context.Process(target=work,
+                        args=(cache, options, seed, start, results))
+        for seed in range(options.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    outcome = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    hits = sum(hits for hits, _ in outcome)
+    elapsed = max(seconds for _, seconds in outcome)
+    total = options.ops * options.workers
+    expected = options.workers * -(-options.ops // INCR_EVERY)
+    return (
+        f'{total / elapsed:,.0f}',
+        f'{hits / total:.1%}',
+        f'{cache.get(COUNTER)}/{expected}',
+    )
+
+
+def main():
+    options = parser(__doc__, workers=4, ops=5000, keys=500,
+                     value_size=2048).parse_args()
+    setup()
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        locations = {
+            'locmem': 'bench',
+            'file': os.path.join(directory, 'files'),
+            'sqlite': os.path.join(directory, 'cache.sqlite3'),
+        }
+        for name, backend in BACKENDS:
+            rows.append((name, *run(backend, locations[name], options)))
+    print(f'{options.workers} процессов по {options.ops} операций, '
+          f'{options.keys} ключей')
+    print_table(('backend', 'ops/s', 'hit rate', 'counter'), rows)
+
+
+if __name__ == '__main__':
+    main()
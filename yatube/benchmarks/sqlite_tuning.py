@@ -0,0 +1,98 @@
+"""Чтение и запись из нескольких процессов: SQLite по умолчанию и с
+прагмами SQLITE_PRAGMAS.
+
+Читатели выбирают страницу главной ленты, писатели добавляют
+комментарии, как add_comment. Ошибки — запросы, упавшие с
+``database is locked``.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from ._common import parser, print_table, seed_posts, setup, test_database
+
+# Как без core.db: журнал delete, остальные прагмы по умолчанию.
+DEFAULT_PRAGMAS = {'journal_mode': 'delete'}
+
+
+def work(kind, seconds, start, results):
+    from django.db import OperationalError, connection
+
+    from posts.models import Comment, Post
+
+    post = Post.objects.first()
+    done = errors = 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if kind == 'read':
+                list(Post.objects.select_related('author', 'group')[:10])
+            else:
+                Comment.objects.create(post=post, author_id=post.author_id,
+                                       text='Комментарий')
+            done += 1
+        except OperationalError:
+            errors += 1
+    connection.close()
+    results.put((kind, done, errors))
+
+
+def run(pragmas, options):
+    from django.conf import settings
+    from django.db import connection
+
+    settings.SQLITE_PRAGMAS = pragmas
+    # Режим журнала хранится в файле базы: переключаем его до запуска
+    # процессов, пока других соединений нет.
+    connection.close()
+    connection.ensure_connection()
+    connection.close()
+    context = multiprocessing.get_context('fork')
+    kinds = ['read'] * options.readers + ['write'] * options.writers
+    start = context.Barrier(len(kinds))
+    results = context.Queue()
+    workers = [
+        context.Process(target=work,
+                        args=(kind, options.seconds, start, results))
+        for kind in kinds
+    ]
+    for worker in workers:
+        worker.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in workers:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for worker in workers:
+        worker.join()
+    return (
+        f'{totals["read"][0] / options.seconds:,.0f}',
+        f'{totals["write"][0] / options.seconds:,.0f}',
+        totals['read'][1] + totals['write'][1],
+    )
+
+
+def main():
+    options = parser(__doc__, posts=10_000, readers=4, writers=2,
+                     seconds=3.0).parse_args()
+    setup()
+
+    from django.conf import settings
+
+    tuned = dict(settings.SQLITE_PRAGMAS)
+    with tempfile.TemporaryDirectory() as directory:
+        with test_database(os.path.join(directory, 'bench.sqlite3')):
+            seed_posts(options.posts, authors=100, groups=10)
+            rows = [
+                ('default', *run(DEFAULT_PRAGMAS, options)),
+                ('SQLITE_PRAGMAS', *run(tuned, options)),
+            ]
+    print(f'{options.readers} читателей, {options.writers} писателей, '
+          f'{options.seconds:g} с')
+    print_table(('pragmas', 'reads/s', 'writes/s', 'locked'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Лента подписок: join Follow x Post против материализованной ленты.
+
+Печатает задержку чтения первой и глубокой страницы ленты и цену записи
+поста (строк на пост и время вставки) в зависимости от числа подписчиков.
+"""
+import random
+
+from ._common import measure, parser, print_table, setup, test_database
+
+
+def main():
+    options = parser(__doc__, authors=300, posts_per_author=100,
+                     readers=200, follows_per_reader=50,
+                     repeat=5).parse_args()
+    setup()
+
+    from django.contrib.auth import get_user_model
+    from django.core.paginator import Paginator
+
+    from posts.models import Follow, Post, TimelineEntry
+    from posts.timeline import follow_feed
+
+    User = get_user_model()
+    rng = random.Random(0)
+    with test_database():
+        User.objects.bulk_create([
+            User(username=f'author-{num}') for num in range(options.authors)
+        ])
+        User.objects.bulk_create([
+            User(username=f'reader-{num}') for num in range(options.readers)
+        ])
+        authors = list(User.objects.filter(username__startswith='author-'))
+        readers = list(User.objects.filter(username__startswith='reader-'))
+        for author in authors:
+            Post.objects.bulk_create([
+                Post(author=author, text=f'Пост {num}')
+                for num in range(options.posts_per_author)
+            ])
+        Follow.objects.bulk_create([
+            Follow(user=reader, author=author)
+            for reader in readers
+            for author in rng.sample(authors, options.follows_per_reader)
+        ])
+        reader = readers[0]
+        join_feed = Post.objects.select_related('author', 'group').filter(
+            author__following__user=reader)
+        timeline_feed = follow_feed(reader).select_related('author', 'group')
+
+        def read(feed, number):
+            return measure(lambda: list(Paginator(feed, 10).page(number)),
+                           options.repeat)
+
+        last_page = Paginator(join_feed, 10).num_pages
+        rows = [
+            (number,
+             f'{read(join_feed, number):.2f}',
+             f'{read(timeline_feed, number):.2f}')
+            for number in (1, last_page // 2, last_page)
+        ]
+        print(f'Чтение ленты ({options.follows_per_reader} подписок, '
+              f'{TimelineEntry.objects.count()} записей в лентах)')
+        print_table(('page', 'join, ms', 'timeline, ms'), rows)
+
+        rows = []
+        for followers in (0, 10, 100, len(readers)):
+            author = User.objects.create(username=f'writer-{followers}')
+            Follow.objects.bulk_create([
+                Follow(user=reader, author=author)
+                for reader in readers[:followers]
+            ])
+            before = TimelineEntry.objects.count()
+            insert_ms = measure(
+                lambda: Post.objects.create(author=author, text='Новый'),
+                options.repeat)
+            written = (TimelineEntry.objects.count() - before) / options.repeat
+            rows.append((followers, f'{1 + written:.0f}', f'{insert_ms:.2f}'))
+        print()
+        print('Запись поста (join пишет 1 строку на пост)')
+        print_table(('followers', 'rows/post', 'insert, ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
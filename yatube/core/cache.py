@@ -0,0 +1,253 @@
+"""Общий для процессов кэш в файле SQLite.
+
+LocMemCache у каждого процесса WSGI свой: с ростом числа процессов падает
+доля попаданий, а инвалидация (posts.caching.bump, posts.object_cache)
+доходит только до процесса, который выполнил запись. SQLiteCache хранит
+записи в одном файле, который открывают все процессы машины, и не требует
+отдельного сервера.
+
+Настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {
+                'MAX_ENTRIES': 100_000,
+                'MAX_BYTES': 256 * 1024 * 1024,
+            },
+        }
+    }
+
+При превышении MAX_ENTRIES или MAX_BYTES сначала удаляются просроченные
+записи, затем давно не читанные (LRU по времени последнего чтения) долями
+по 1/CULL_FREQUENCY. Число записей и их суммарный размер поддерживают
+триггеры, поэтому проверка лимитов не считает таблицу целиком. incr()
+атомарен между процессами, add() выполняется одним UPSERT.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Время чтения обновляется не чаще раза в секунду: для LRU этого хватает,
+# а горячие ключи не превращают каждое чтение в запись.
+ACCESS_RESOLUTION = 1.0
+# Ограничение SQLite на число параметров запроса.
+MAX_PARAMS = 900
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0);
+    CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache
+    BEGIN
+        UPDATE cache_stats SET entries = entries + 1,
+                               bytes = bytes + NEW.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache
+    BEGIN
+        UPDATE cache_stats SET entries = entries - 1,
+                               bytes = bytes - OLD.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS cache_resize AFTER UPDATE OF size ON cache
+    BEGIN
+        UPDATE cache_stats SET bytes = bytes + NEW.size - OLD.size;
+    END;
+"""
+
+UPSERT = """
+    INSERT INTO cache (key, value, expires, accessed, size)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value,
+        expires = excluded.expires, accessed = excluded.accessed,
+        size = excluded.size
+"""
+
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение своё у каждого потока и заново открывается после
+        # fork: соединения SQLite нельзя передавать между процессами.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self._path, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        names = {self._key(key, version): key for key in keys}
+        connection = self._connection()
+        now = time.time()
+        result, touched = {}, []
+        names_list = list(names)
+        for start in range(0, len(names_list), MAX_PARAMS):
+            chunk = names_list[start:start + MAX_PARAMS]
+            rows = connection.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))}) AND {ALIVE}',
+                chunk + [now])
+            for name, value, accessed in rows:
+                result[names[name]] = pickle.loads(value)
+                if accessed < now - ACCESS_RESOLUTION:
+                    touched.append((now, name))
+        if touched:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            # Запись больше всего кэша не сохраняется, как в memcached.
+            if len(blob) <= self._max_bytes:
+                rows.append((self._key(key, version), blob, expires, now,
+                             len(blob)))
+        connection = self._connection()
+        with self._transaction(connection):
+            connection.executemany(UPSERT, rows)
+        self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        name = self._key(key, version)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        connection = self._connection()
+        cursor = connection.execute(
+            UPSERT + ' WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (name, blob, self._expires(timeout), now, len(blob), now))
+        self._cull(connection, now)
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        cursor = self._connection().execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self._expires(timeout), self._key(key, version), now))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        name = self._key(key, version)
+        connection = self._connection()
+        with self._transaction(connection):
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                (name, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (blob, len(blob), name))
+        return value
+
+    def has_key(self, key, version=None):
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (self._key(key, version), time.time())).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        connection = self._connection()
+        for start in range(0, len(names), MAX_PARAMS):
+            chunk = names[start:start + MAX_PARAMS]
+            connection.execute(
+                f'DELETE FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def stats(self):
+        """Число записей и их суммарный размер в байтах."""
+        return self._connection().execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+
+    def _transaction(self, connection):
+        return _Immediate(connection)
+
+    def _cull(self, connection, now):
+        entries, size = self.stats()
+        if entries <= self._max_entries and size <= self._max_bytes:
+            return
+        with self._transaction(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE expires IS NOT NULL '
+                'AND expires <= ?', (now,))
+            entries, size = self.stats()
+            while entries > self._max_entries or size > self._max_bytes:
+                if not self._cull_frequency:
+                    connection.execute('DELETE FROM cache')
+                    return
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed LIMIT ?)',
+                    (max(entries - self._max_entries,
+                         entries // self._cull_frequency, 1),))
+                entries, size = self.stats()
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT: блокировка записи берётся сразу,
+    поэтому чтение и запись внутри не пересекаются с другими
+    процессами."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
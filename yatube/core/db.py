@@ -0,0 +1,34 @@
+"""Настройка соединений SQLite.
+
+Без настройки SQLite работает в режиме журнала ``delete``: запись
+блокирует всю базу, и читатели лент ждут ``post_create`` и
+``add_comment``, а при долгом ожидании получают ``database is locked``.
+``configure_sqlite`` выполняет ``PRAGMA`` из ``SQLITE_PRAGMAS`` для
+каждого нового соединения: WAL позволяет читать во время записи,
+``synchronous = normal`` убирает fsync на каждую фиксацию (в WAL это
+не грозит целостности), ``mmap_size`` и ``cache_size`` держат горячие
+страницы в памяти, ``busy_timeout`` заставляет ждать блокировку, а не
+сразу падать.
+
+У отдельной базы значения можно переопределить ключом ``PRAGMAS``
+в ``DATABASES``; ``None`` отключает прагму.
+"""
+from django.conf import settings
+
+
+def pragmas(connection):
+    """Прагмы соединения: общие из настроек и свои у базы."""
+    values = dict(settings.SQLITE_PRAGMAS)
+    values.update(connection.settings_dict.get('PRAGMAS', {}))
+    return {name: value for name, value in values.items()
+            if value is not None}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas(connection).items():
+            if not name.isidentifier():
+                raise ValueError(f'Недопустимое имя прагмы: {name!r}')
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,37 @@
+import math
+import time
+
+from django.conf import settings
+
+from . import routers
+
+PRIMARY_COOKIE = 'primary_until'
+
+
+class ReadYourWritesMiddleware:
+    """Пользователь, который только что писал в базу (пост, комментарий,
+    подписка), читает из основной базы, пока реплики могут отставать.
+
+    Срок хранится в cookie, а не в сессии: иначе каждое чтение сессии
+    тоже пришлось бы направлять в основную базу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        routers.begin_request(until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request()
+        if wrote and settings.DATABASE_REPLICAS:
+            lag = settings.REPLICA_LAG_SECONDS
+            response.set_cookie(PRIMARY_COOKIE, f'{time.time() + lag:.3f}',
+                                max_age=math.ceil(lag), httponly=True,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,98 @@
+"""Чтение из реплик, запись в основную базу.
+
+Чтения уходят на случайную базу из ``DATABASE_REPLICAS``, запись и всё,
+что выполняется внутри транзакции, — в ``default``. Пустой список реплик
+оставляет всё на основной базе.
+
+Реплика отстаёт, поэтому после записи пользователь ещё
+``REPLICA_LAG_SECONDS`` секунд читает из основной базы
+(``ReadYourWritesMiddleware``), а всё, что кладётся в общий кэш,
+читается из основной базы всегда (``use_primary``): запись кэша,
+построенная по отставшей реплике под новым поколением, пережила бы
+само отставание. Служебные записи при чтении (ленивое заполнение
+счётчиков) делаются в ``background_writes`` и запрос к основной базе не
+привязывают.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def pinned():
+    return getattr(_state, 'pinned', False)
+
+
+@contextmanager
+def use_primary():
+    """Чтения внутри блока идут в основную базу."""
+    previous = pinned()
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = previous
+
+
+@contextmanager
+def background_writes():
+    """Записи внутри блока не считаются записями пользователя."""
+    previous = getattr(_state, 'background', False)
+    _state.background = True
+    try:
+        yield
+    finally:
+        _state.background = previous
+
+
+def begin_request(pin):
+    _state.pinned = pin
+    _state.wrote = False
+
+
+def end_request():
+    """Сбрасывает состояние запроса; True, если запрос писал в базу."""
+    wrote = getattr(_state, 'wrote', False)
+    _state.pinned = _state.wrote = False
+    return wrote
+
+
+def _elsewhere(hints):
+    """True, если объект из подсказки живёт в базе вне основной и реплик:
+    тогда её выбирает Django, как без роутера."""
+    instance = hints.get('instance')
+    db = instance._state.db if instance is not None else None
+    return db is not None and db not in {DEFAULT_DB_ALIAS,
+                                         *settings.DATABASE_REPLICAS}
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if _elsewhere(hints):
+            return None
+        if (not replicas or pinned()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if _elsewhere(hints):
+            return None
+        if not getattr(_state, 'background', False):
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает в реплики вместе с данными.
+        return db not in settings.DATABASE_REPLICAS
@@ -1,8 +1,27 @@
+from django.core.cache import cache
+from django.http import HttpResponseNotFound
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+# Тело 404 для анонимных посетителей рендерится один раз с меткой вместо
+# адреса и хранится в кэше: сканеры, перебирающие адреса, не тратят
+# на каждый запрос рендер шаблона.
+NOT_FOUND_KEY = 'core:404'
+PATH_PLACEHOLDER = '__404_PATH__'
 
 
 def page_not_found(request, exception):
-    return render(request, 'core/404.html', {'path': request.path}, status=404)
+    if request.user.is_authenticated:
+        return render(request, 'core/404.html', {'path': request.path},
+                      status=404)
+    body = cache.get(NOT_FOUND_KEY)
+    if body is None:
+        body = render_to_string('core/404.html', {'path': PATH_PLACEHOLDER},
+                                request)
+        cache.set(NOT_FOUND_KEY, body, None)
+    return HttpResponseNotFound(
+        body.replace(PATH_PLACEHOLDER, escape(request.path)))
 
 
 def permission_denied(request, reason=''):
@@ -0,0 +1,376 @@
+"""Кэш страниц для анонимных посетителей с инвалидацией по поколениям.
+
+У каждой области данных (``all``, ``group:<id>``, ``author:<id>``,
+``post:<id>``) есть номер поколения в кэше. Представление объявляет,
+от каких областей зависит страница (``depends_on``), и в запись кэша
+вместе с HTML попадают номера их поколений на момент чтения данных.
+Запись в базу (сигналы в posts.signals) увеличивает поколение своих
+областей сразу и ещё раз после фиксации транзакции, после чего все
+зависящие от них страницы перестают совпадать и строятся заново. Срок
+жизни записей не ограничен: страница отдаётся из кэша, пока не
+изменились её данные.
+
+Тот же номер поколения ``post:<id>`` служит версией HTML-карточки поста
+в лентах (``cached_cards``): правка поста или новый комментарий меняют
+версию, и карточка рендерится заново.
+
+Страницы и карточки читаются через ``tiers``: перед общим кэшем
+``default`` стоит небольшой LRU в памяти процесса, и горячие записи
+не распаковываются из общего кэша на каждом запросе. Поколения всегда
+читаются из общего кэша, поэтому запись в любом процессе делает копии
+в памяти остальных процессов промахами при первой же сверке версий.
+
+Устаревшая страница или страница карточек перестраивается одним
+запросом (``fetch``): он берёт аренду в общем кэше, остальные процессы
+до конца перестроения отдают прежнее значение, а потоки одного процесса
+без прежнего значения ждут общего результата. Со сроком жизни записи
+перестраиваются заранее, с вероятностью, растущей к концу срока.
+Внутри построения страницы вложенные записи (срезы карточек) в
+устаревшем виде не отдаются: страница уже запомнила текущие поколения и
+сохранилась бы с устаревшими данными как свежая.
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from core.routers import use_primary
+
+SITE = 'site'
+ALL = 'all'
+
+
+class TwoTierCache:
+    """LRU в памяти процесса (L1) перед общим кэшем (L2).
+
+    Годится только для записей, которые не меняются под своим ключом:
+    в ключе есть номера поколений, или запись сверяется с поколениями
+    при каждом чтении (valid). Значения L1 отдаются без копирования,
+    поэтому хранить в нём можно только то, что читатели не изменяют.
+
+    ``hits`` считает попадания в L1 и L2 и промахи обоих уровней.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+
+    def get(self, key, default=None, valid=None, stale=None):
+        return self.get_many([key], valid, stale).get(key, default)
+
+    def get_many(self, keys, valid=None, stale=None):
+        """Значения по ключам; не прошедшие valid не возвращаются,
+        а попадают в словарь stale, если он передан."""
+        keys = list(keys)
+        with self._lock:
+            local = {key: self._entries[key]
+                     for key in keys if key in self._entries}
+            for key in local:
+                self._entries.move_to_end(key)
+        found = self._check(local, valid, stale)
+        missing = [key for key in keys if key not in found]
+        shared = {}
+        if missing:
+            shared = self._check(cache.get_many(missing), valid, stale)
+            self._remember(shared)
+        self.hits['l1'] += len(found)
+        self.hits['l2'] += len(shared)
+        self.hits['miss'] += len(missing) - len(shared)
+        found.update(shared)
+        return found
+
+    @staticmethod
+    def _check(values, valid, stale):
+        if valid is None:
+            return values
+        checked = {}
+        for key, value in values.items():
+            if valid(value):
+                checked[key] = value
+            elif stale is not None:
+                stale[key] = value
+        return checked
+
+    def set(self, key, value, timeout):
+        self.set_many({key: value}, timeout)
+
+    def set_many(self, data, timeout):
+        cache.set_many(data, timeout)
+        self._remember(data)
+
+    def _remember(self, data):
+        with self._lock:
+            for key, value in data.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > settings.L1_CACHE_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_rates(self):
+        """Доли попаданий в L1 и L2 среди всех чтений; None без
+        чтений."""
+        total = sum(self.hits.values())
+        if not total:
+            return None
+        return {'l1': self.hits['l1'] / total, 'l2': self.hits['l2'] / total}
+
+
+tiers = TwoTierCache()
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _generation_key(scope):
+    return f'gen:{scope}'
+
+
+def generations(scopes):
+    """Текущие поколения областей одним get_many; недостающие
+    заводятся заново."""
+    keys = {_generation_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    result = {keys[key]: value for key, value in found.items()}
+    for key, scope in keys.items():
+        if key not in found:
+            # Новое поколение берётся от времени, а не с единицы, чтобы
+            # после вытеснения ключа не ожили старые страницы.
+            cache.add(key, time.time_ns(), None)
+            result[scope] = cache.get(key)
+    return result
+
+
+def _increment(scopes):
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def bump(*scopes, using=None):
+    """Делает устаревшими все страницы, зависящие от областей.
+
+    Внутри транзакции базы using поколения увеличиваются ещё раз после
+    её фиксации: запрос, прочитавший данные до фиксации, успел бы
+    сохранить старую страницу под новым поколением, и она отдавалась бы
+    до следующей записи.
+    """
+    scopes = set(scopes)
+    _increment(scopes)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: _increment(scopes), using=using)
+
+
+def depends_on(request, *scopes):
+    """Отмечает, что страница строится из данных этих областей.
+
+    Вызывать до чтения данных: поколения фиксируются сразу, и запись,
+    случившаяся во время построения страницы, сделает её устаревшей.
+    """
+    page_scopes = getattr(request, '_page_cache_scopes', None)
+    if page_scopes is not None:
+        page_scopes.update(generations(scopes + (SITE,)))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+# Перестроения (rebuild), отданные устаревшие значения (stale) и запросы,
+# дождавшиеся перестроения в другом потоке (shared), в пределах процесса.
+stampede = Counter()
+
+# Глубина построения страниц cache_anonymous_page в текущем потоке.
+_page_builds = threading.local()
+
+
+def _building_page():
+    return getattr(_page_builds, 'depth', 0) > 0
+
+
+def single_flight(key, func):
+    """Выполняет func() один раз для одновременных вызовов с тем же
+    ключом из потоков процесса; остальные получают тот же результат."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        stampede['shared'] += 1
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = func()
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.result
+
+
+def _expires_early(delta, expires):
+    # XFetch: чем дольше перестроение (delta) и ближе конец срока, тем
+    # вероятнее, что запрос перестроит значение заранее.
+    if expires is None:
+        return False
+    gap = -delta * settings.CACHE_EARLY_RECOMPUTE_BETA * math.log(
+        1 - random.random())
+    return time.time() + gap >= expires
+
+
+def _rebuild(key, build, timeout):
+    stampede['rebuild'] += 1
+    started = time.monotonic()
+    # Запись кэша переживёт отставание реплики, поэтому строится
+    # по основной базе.
+    with use_primary():
+        value = build()
+    if value is not None:
+        expires = None if timeout is None else time.time() + timeout
+        # Запись живёт в кэше дольше своего срока, чтобы после него
+        # было что отдавать, пока идёт перестроение.
+        tiers.set(key, (value, time.monotonic() - started, expires),
+                  None if timeout is None else timeout * 2)
+    return value
+
+
+def fetch(key, fresh, build, timeout):
+    """Значение под key или результат build() с защитой от лавины
+    перестроений.
+
+    fresh(value) проверяет, что значение построено из текущих данных;
+    build() строит новое, None не кэшируется. timeout — срок жизни в
+    секундах или None.
+    """
+    stale = {}
+    entry = tiers.get(key, valid=lambda entry: fresh(entry[0]),
+                      stale=stale)
+    if entry is not None:
+        value, delta, expires = entry
+        if not _expires_early(delta, expires):
+            return value
+    elif key in stale and not _building_page():
+        value = stale[key][0]
+    else:
+        return single_flight(key, lambda: _rebuild(key, build, timeout))
+    lease = f'lease:{key}'
+    if not cache.add(lease, True, settings.CACHE_LEASE_TIMEOUT):
+        stampede['stale'] += 1
+        return value
+    try:
+        return _rebuild(key, build, timeout)
+    finally:
+        cache.delete(lease)
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}'
+
+
+def _fresh(entry):
+    page_generations = entry[2]
+    return generations(page_generations) == page_generations
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницу для анонимных GET-запросов.
+
+    Закэшированная страница отдаётся, только если поколения всех
+    областей, объявленных через depends_on, не изменились; пока её
+    перестраивает другой запрос, отдаётся прежняя (fetch).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        responses = []
+
+        def build():
+            request._page_cache_scopes = {}
+            _page_builds.depth = getattr(_page_builds, 'depth', 0) + 1
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                _page_builds.depth -= 1
+            responses.append(response)
+            if response.status_code == 200 and request._page_cache_scopes:
+                return (response.content, response['Content-Type'],
+                        request._page_cache_scopes)
+            return None
+
+        entry = fetch(_page_key(request), _fresh, build,
+                      settings.PAGE_CACHE_TIMEOUT)
+        if responses:
+            return responses[0]
+        if entry is None:
+            # Соседний поток построил страницу, которая не кэшируется.
+            return view(request, *args, **kwargs)
+        content, content_type, _ = entry
+        return HttpResponse(content, content_type=content_type)
+    return wrapper
+
+
+def cached_cards(posts, render, variant='', prepare=None):
+    """HTML карточек постов из кэша, недостающие строит render(post).
+
+    Версии всех карточек страницы читаются одним get_many, сами карточки
+    вторым, поэтому страница из десяти постов обходится двумя обращениями
+    к кэшу. variant различает карточки, которые шаблон выводит по-разному
+    (например, без автора на странице профиля). prepare(posts) получает
+    разом все посты, карточки которых предстоит построить, чтобы
+    дополнить их пакетными запросами.
+    """
+    posts = list(posts)
+    versions = generations(
+        [post_scope(post.pk) for post in posts] + [SITE])
+    keys = {
+        f'card:{variant}:{post.pk}:{versions[post_scope(post.pk)]}'
+        f':{versions[SITE]}': post
+        for post in posts
+    }
+    cards = tiers.get_many(keys)
+    to_render = {key: post for key, post in keys.items() if key not in cards}
+    if prepare is not None and to_render:
+        prepare(list(to_render.values()))
+    missing = {key: render(post) for key, post in to_render.items()}
+    if missing:
+        tiers.set_many(missing, settings.PAGE_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [cards[key] for key in keys]
@@ -0,0 +1,279 @@
+"""Карточки постов для лент.
+
+Ленты выводят посты через ``posts/includes/post_include.html``, которому
+нужны несколько полей поста, имя автора и slug группы. ``FeedQuery``
+читает ровно их через ``values()``, без ``select_related`` целых моделей:
+из ``auth_user`` не выбираются хэш пароля, почта и флаги, из
+``posts_group`` описание. Строки превращаются в ``FeedCard`` со
+``__slots__`` вместо экземпляров моделей.
+
+Страницы лент с известными областями кэша (``posts.caching``) хранятся в
+кэше в компактном формате ``pack``: числа карточек (id, дата, число
+комментариев, размеры миниатюры) упакованы в один ``array('q')``, строки
+лежат плоским кортежем. Сверх самих строк такая запись занимает в
+несколько раз меньше pickle моделей и разбирается в разы быстрее
+(``benchmarks.card_format``).
+Номер формата входит в ключ: запись другой версии не читается.
+
+Картинка выводится по адресу и размерам миниатюры, которые записаны в пост
+при загрузке (``posts.images``), поэтому рендер ленты не обращается к
+хранилищу ключей sorl-thumbnail. Горячие
+страницы лежат ещё и в памяти процесса (``caching.tiers``) уже
+упакованными: распаковка создаёт новые карточки, и общие копии никто
+не изменяет.
+"""
+from array import array
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import caching
+from .models import Post
+from .timeline import MergedFeed
+
+CARD_FORMAT = 4
+
+CARD_VALUES = (
+    'id', 'text', 'pub_date', 'image', 'thumbnail_url', 'thumbnail_width',
+    'thumbnail_height', 'thumbnail_srcset', 'thumbnail_webp_srcset',
+    'placeholder_color', 'placeholder', 'comment_count',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug',
+)
+
+
+class CardAuthor:
+    __slots__ = ('username', 'first_name', 'last_name')
+
+    def __init__(self, username, first_name, last_name):
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def __str__(self):
+        return self.username
+
+    def get_full_name(self):
+        # Так же, как AbstractUser.get_full_name.
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+class CardGroup:
+    __slots__ = ('slug',)
+
+    def __init__(self, slug):
+        self.slug = slug
+
+
+class FeedCard:
+    """Пост в ленте: только то, что выводит карточка.
+
+    feed_date и feed_id заполняются в ленте подписок, где по ним идут
+    сортировка и курсоры (posts.timeline.FEED_ORDERING).
+    """
+
+    __slots__ = ('id', 'text', 'pub_date', 'image', 'thumbnail_url',
+                 'thumbnail_width', 'thumbnail_height', 'thumbnail_srcset',
+                 'thumbnail_webp_srcset', 'placeholder_color', 'placeholder',
+                 'comment_count', 'author', 'group', 'feed_date', 'feed_id')
+
+    def __init__(self, id, text, pub_date, image, thumbnail_url,
+                 thumbnail_width, thumbnail_height, thumbnail_srcset,
+                 thumbnail_webp_srcset, placeholder_color, placeholder,
+                 comment_count, author, group, feed_date=None, feed_id=None):
+        self.id = id
+        self.text = text
+        self.pub_date = pub_date
+        self.image = image
+        self.thumbnail_url = thumbnail_url
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_height = thumbnail_height
+        self.thumbnail_srcset = thumbnail_srcset
+        self.thumbnail_webp_srcset = thumbnail_webp_srcset
+        self.placeholder_color = placeholder_color
+        self.placeholder = placeholder
+        self.comment_count = comment_count
+        self.author = author
+        self.group = group
+        self.feed_date = feed_date
+        self.feed_id = feed_id
+
+    @classmethod
+    def from_row(cls, row):
+        """Карточка из строки values(*CARD_VALUES)."""
+        return cls(
+            row['id'], row['text'], row['pub_date'], row['image'],
+            row['thumbnail_url'], row['thumbnail_width'],
+            row['thumbnail_height'], row['thumbnail_srcset'],
+            row['thumbnail_webp_srcset'], row['placeholder_color'],
+            row['placeholder'], row['comment_count'],
+            CardAuthor(row['author__username'], row['author__first_name'],
+                       row['author__last_name']),
+            CardGroup(row['group__slug'])
+            if row['group__slug'] is not None else None,
+            row.get('feed_date'), row.get('feed_id'),
+        )
+
+    def __repr__(self):
+        return f'<FeedCard {self.id}>'
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        # Карточка равна посту, который она показывает.
+        if not isinstance(other, (FeedCard, Post)):
+            return NotImplemented
+        return self.pk == other.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Числа и строки одной карточки в упакованной записи. Размеры миниатюры
+# без картинки записываются нулями.
+_NUMBERS = 5
+_FEED_NUMBERS = 2
+_STRINGS = 11
+
+
+def _to_micros(value):
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(micros):
+    value = _EPOCH + micros * _MICROSECOND
+    if settings.USE_TZ:
+        return timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def pack(cards):
+    """Компактная запись списка карточек для кэша."""
+    cards = list(cards)
+    with_feed = any(card.feed_id is not None for card in cards)
+    numbers = array('q')
+    strings = []
+    for card in cards:
+        numbers.extend((card.id, _to_micros(card.pub_date),
+                        card.comment_count, card.thumbnail_width or 0,
+                        card.thumbnail_height or 0))
+        if with_feed:
+            numbers.extend((_to_micros(card.feed_date), card.feed_id))
+        strings.extend((
+            card.text, card.image, card.thumbnail_url, card.thumbnail_srcset,
+            card.thumbnail_webp_srcset, card.placeholder_color,
+            card.placeholder, card.author.username,
+            card.author.first_name, card.author.last_name,
+            card.group.slug if card.group is not None else '',
+        ))
+    return CARD_FORMAT, with_feed, numbers.tobytes(), tuple(strings)
+
+
+def unpack(data):
+    """Карточки из записи pack(); None для записи другого формата."""
+    if not isinstance(data, tuple) or not data or data[0] != CARD_FORMAT:
+        return None
+    _, with_feed, raw, strings = data
+    numbers = array('q')
+    numbers.frombytes(raw)
+    step = _NUMBERS + (_FEED_NUMBERS if with_feed else 0)
+    cards = []
+    for start, offset in zip(range(0, len(numbers), step),
+                             range(0, len(strings), _STRINGS)):
+        (text, image, thumbnail_url, thumbnail_srcset, thumbnail_webp_srcset,
+         placeholder_color, placeholder, username, first_name, last_name,
+         slug) = strings[offset:offset + _STRINGS]
+        feed_date = feed_id = None
+        if with_feed:
+            feed_date = _from_micros(numbers[start + _NUMBERS])
+            feed_id = numbers[start + _NUMBERS + 1]
+        cards.append(FeedCard(
+            numbers[start], text, _from_micros(numbers[start + 1]), image,
+            thumbnail_url, numbers[start + 3] or None,
+            numbers[start + 4] or None, thumbnail_srcset,
+            thumbnail_webp_srcset, placeholder_color, placeholder,
+            numbers[start + 2],
+            CardAuthor(username, first_name, last_name),
+            CardGroup(slug) if slug else None,
+            feed_date, feed_id,
+        ))
+    return cards
+
+
+class FeedQuery:
+    """Выборка постов, отдающая FeedCard вместо моделей.
+
+    Поддерживает то, что нужно CountedPaginator, CursorPaginator и
+    MergedFeed: count(), срезы, filter(), order_by() и query.
+
+    С cache_scopes срезы неотфильтрованной выборки кэшируются в формате
+    pack вместе с поколениями областей, из которых построены, и
+    перестраиваются через caching.fetch после смены любого из них.
+    """
+
+    ordered = True
+    model = Post
+
+    def __init__(self, queryset, cache_scopes=()):
+        self.queryset = queryset
+        self.cache_scopes = tuple(cache_scopes)
+
+    @property
+    def query(self):
+        return self.queryset.query
+
+    def filter(self, *args, **kwargs):
+        return FeedQuery(self.queryset.filter(*args, **kwargs))
+
+    def order_by(self, *ordering):
+        return FeedQuery(self.queryset.order_by(*ordering))
+
+    def select_related(self, *fields):
+        # Связанные поля уже входят в CARD_VALUES.
+        return self
+
+    def count(self):
+        return self.queryset.count()
+
+    def _values(self):
+        return self.queryset.values(
+            *CARD_VALUES, *self.queryset.query.annotations)
+
+    def __iter__(self):
+        return map(FeedCard.from_row, self._values())
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return FeedCard.from_row(self._values()[key])
+        if not self.cache_scopes or key.step is not None:
+            return [FeedCard.from_row(row) for row in self._values()[key]]
+        versions = caching.generations(self.cache_scopes + (caching.SITE,))
+        cache_key = 'cards:{}:{}:{}:{}'.format(
+            CARD_FORMAT, '+'.join(self.cache_scopes), key.start or 0,
+            key.stop)
+        _, data = caching.fetch(
+            cache_key,
+            lambda entry: entry[0] == versions,
+            lambda: (versions, pack(map(FeedCard.from_row,
+                                        self._values()[key]))),
+            settings.PAGE_CACHE_TIMEOUT)
+        return unpack(data)
+
+
+def feed_cards(feed, cache_scopes=()):
+    """Карточки для выборки постов или слитой ленты подписок.
+
+    cache_scopes — области posts.caching, от которых зависит выборка;
+    страницы такой ленты берутся из кэша.
+    """
+    if isinstance(feed, MergedFeed):
+        return MergedFeed([FeedQuery(stream) for stream in feed.streams],
+                          feed.ordering)
+    return FeedQuery(feed, cache_scopes)
@@ -1,6 +1,9 @@
 from django import forms
+from django.contrib.auth import get_user_model
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
+
+User = get_user_model()
 
 
 class PostForm(forms.ModelForm):
@@ -21,3 +24,24 @@ class CommentForm(forms.ModelForm):
             required=True,
             widget=forms.Textarea,
         )
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200)
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+        empty_label='Все группы',
+    )
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Нет такого автора')
+        return author
@@ -0,0 +1,228 @@
+"""Миниатюры картинок постов, построенные при загрузке.
+
+Карточка поста выводит картинку в варианте ``CARD_GEOMETRY``. Тег
+``{% thumbnail %}`` в шаблоне на каждый пост читал хранилище ключей
+sorl-thumbnail, а первый просмотр после загрузки ещё и строил файл,
+задерживая ответ. Теперь миниатюра строится, когда пост с новой
+картинкой сохранён и транзакция зафиксирована (сигнал в posts.signals),
+её адрес и размеры записываются в сам пост, и шаблоны выводят их как
+обычные поля. Посты, сохранённые до этого,
+догоняет команда ``generate_thumbnails``.
+
+Пока ``generate_thumbnails`` не прошла, уже построенные миниатюры таких
+постов находит ``resolve_thumbnails``: для всей страницы ленты одним
+``get_many`` к кэшу хранилища ключей sorl-thumbnail и не больше чем одним
+запросом к его таблице, а не обращением на каждый пост.
+
+Миниатюра строится в нескольких ширинах ``CARD_WIDTHS`` в формате
+исходной картинки и в WebP. Шаблоны выводят их через ``srcset``, и
+браузер телефона загружает вариант по своему экрану, а не 960 пикселей
+JPEG (``benchmarks.image_bytes``). Поле ``thumbnail_url`` — самый широкий
+вариант в исходном формате, он же ``src`` для браузеров без ``srcset``.
+
+Пока миниатюра загружается, на её месте виден заполнитель: основной цвет
+картинки и растянутое браузером размытое превью в полторы сотни байт
+WebP, вписанное в страницу data-адресом. Их тоже считает загрузка
+(``placeholder_fields``), а не рендер.
+"""
+import base64
+from io import BytesIO
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+
+CARD_GEOMETRY = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+CARD_WIDTHS = (480, 720, 960)
+WEBP = 'WEBP'
+# Качество THUMBNAIL_QUALITY рассчитано на JPEG; WebP при 80 выглядит
+# не хуже и заметно легче.
+WEBP_OPTIONS = {'format': WEBP, 'quality': 80}
+
+# Превью 16x6 примерно повторяет пропорции карточки.
+PLACEHOLDER_SIZE = (16, 6)
+PLACEHOLDER_QUALITY = 50
+# Основной цвет — самый частый из стольких цветов уменьшенной картинки.
+PALETTE_COLORS = 8
+
+# Файла нет, он вне MEDIA_ROOT или это не картинка: поста это не ломает,
+# он просто выводится без картинки.
+SOURCE_ERRORS = (OSError, SuspiciousFileOperation, ValueError)
+
+
+def card_geometry(width):
+    """Геометрия варианта миниатюры шириной width с пропорциями
+    CARD_GEOMETRY."""
+    card_width, card_height = map(int, CARD_GEOMETRY.split('x'))
+    return f'{width}x{round(width * card_height / card_width)}'
+
+
+def source_format(image):
+    """Формат, в котором sorl-thumbnail сохранит миниатюру картинки,
+    если не просить другой."""
+    return default.backend._get_format(
+        ImageFile(getattr(image, 'name', image)))
+
+
+def card_thumbnail(image, geometry=CARD_GEOMETRY, **options):
+    """(адрес, ширина, высота) миниатюры для карточки или None, если
+    картинку не удалось прочитать."""
+    try:
+        thumbnail = get_thumbnail(image, geometry,
+                                  **CARD_OPTIONS, **options)
+        # Для нечитаемой картинки sorl возвращает имя несозданного файла.
+        if not thumbnail.exists():
+            return None
+        thumbnail.set_size()
+    except SOURCE_ERRORS:
+        return None
+    return thumbnail.url, thumbnail.width, thumbnail.height
+
+
+def srcset(image, **options):
+    """Значение srcset из вариантов CARD_WIDTHS и самый широкий вариант;
+    None, если картинку не удалось прочитать."""
+    candidates = []
+    for width in CARD_WIDTHS:
+        found = card_thumbnail(image, card_geometry(width), **options)
+        if found is None:
+            return None
+        candidates.append(found)
+    value = ', '.join(f'{url} {width}w' for url, width, _ in candidates)
+    return value, candidates[-1]
+
+
+def thumbnail_fields(image):
+    """Значения полей миниатюры поста для его картинки."""
+    fields = {
+        'thumbnail_url': '',
+        'thumbnail_width': None,
+        'thumbnail_height': None,
+        'thumbnail_srcset': '',
+        'thumbnail_webp_srcset': '',
+    }
+    if not image:
+        return fields
+    image_format = source_format(image)
+    found = srcset(image, format=image_format)
+    if found is None:
+        return fields
+    value, (url, width, height) = found
+    fields.update(thumbnail_url=url, thumbnail_width=width,
+                  thumbnail_height=height, thumbnail_srcset=value)
+    if image_format != WEBP:
+        webp = srcset(image, **WEBP_OPTIONS)
+        if webp is not None:
+            fields['thumbnail_webp_srcset'] = webp[0]
+    return fields
+
+
+def dominant_color(picture):
+    """Самый частый цвет картинки в виде #rrggbb."""
+    small = picture.copy()
+    small.thumbnail((64, 64))
+    palette = small.quantize(colors=PALETTE_COLORS)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def placeholder_fields(image):
+    """Значения полей заполнителя поста для его картинки."""
+    fields = {'placeholder_color': '', 'placeholder': ''}
+    if not image:
+        return fields
+    try:
+        with default_storage.open(getattr(image, 'name', image)) as source:
+            picture = Image.open(source)
+            # JPEG декодируется сразу уменьшенным.
+            picture.draft('RGB', (160, 160))
+            picture = picture.convert('RGB')
+    except SOURCE_ERRORS:
+        return fields
+    preview = BytesIO()
+    ImageOps.fit(picture, PLACEHOLDER_SIZE, Image.LANCZOS).save(
+        preview, WEBP, quality=PLACEHOLDER_QUALITY)
+    fields['placeholder_color'] = dominant_color(picture)
+    fields['placeholder'] = 'data:image/webp;base64,' + base64.b64encode(
+        preview.getvalue()).decode()
+    return fields
+
+
+def refresh(post, using=None):
+    """Строит миниатюру и заполнитель картинки поста и записывает их
+    в пост в обход сигналов."""
+    values = {**thumbnail_fields(post.image),
+              **placeholder_fields(post.image)}
+    for name, value in values.items():
+        setattr(post, name, value)
+    Post.objects.db_manager(using).filter(pk=post.pk).update(**values)
+
+
+def _card_thumbnail_key(image_name):
+    """Ключ записи миниатюры карточки в хранилище sorl-thumbnail.
+
+    Имя файла считается так же, как в ThumbnailBackend.get_thumbnail,
+    но без чтения картинки и хранилища.
+    """
+    backend = default.backend
+    source = ImageFile(image_name)
+    options = dict(CARD_OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, CARD_GEOMETRY, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _stored(keys):
+    """Сериализованные записи sorl-thumbnail по ключам; отсутствующих
+    в ответе нет."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        # У других хранилищ пакетного чтения нет.
+        return {key: kvstore._get_raw(key) for key in keys}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        kvstore.cache.set_many(rows, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(rows)
+    # sorl кладёт в кэш метку EMPTY_VALUE для ключей, которых нет в базе.
+    return {key: value for key, value in found.items()
+            if isinstance(value, str)}
+
+
+def resolve_thumbnails(posts):
+    """Подставляет постам и карточкам без записанной миниатюры адрес и
+    размеры уже построенной миниатюры прежнего вида: одной ширины,
+    без srcset. Недостающие миниатюры не строятся:
+    это дело generate_thumbnails, а не рендера ленты."""
+    waiting = {}
+    for post in posts:
+        if post.image and not post.thumbnail_url:
+            name = getattr(post.image, 'name', post.image)
+            waiting.setdefault(_card_thumbnail_key(name), []).append(post)
+    if not waiting:
+        return
+    for key, value in _stored(list(waiting)).items():
+        thumbnail = deserialize_image_file(value)
+        for post in waiting[key]:
+            post.thumbnail_url = thumbnail.url
+            post.thumbnail_width, post.thumbnail_height = thumbnail.size
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.routers import use_primary
+from posts import caching, images, object_cache, sharding
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры и заполнители картинок постов, у которых '
+            'их ещё нет, например сохранённых до появления posts.images.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить миниатюры всех постов с картинками'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Сколько постов читать одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image', 'thumbnail_url')
+        if not options['all']:
+            # И посты с миниатюрой одной ширины или без заполнителя.
+            posts = posts.filter(
+                Q(thumbnail_srcset='') | Q(placeholder_color=''))
+        built = failed = 0
+        with use_primary():
+            for part in sharding.scatter(posts):
+                for post in part.order_by('pk').iterator(
+                        options['chunk_size']):
+                    images.refresh(post, part.db)
+                    object_cache.forget(Post, post.pk)
+                    if post.thumbnail_url:
+                        built += 1
+                    else:
+                        failed += 1
+        if built:
+            caching.bump(caching.SITE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Построено миниатюр: {built}, не прочитано картинок: {failed}'))
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from posts import sharding
+from posts.models import Comment, Post, TimelineEntry
+
+DELETE_SQL = (
+    'DELETE FROM {comment} WHERE post_id IN '
+    '(SELECT id FROM {post} WHERE author_id = %s)',
+    'DELETE FROM {post} WHERE author_id = %s',
+)
+
+
+class Command(BaseCommand):
+    help = ('Копирует пользователей и группы в шарды POST_SHARDS и переносит '
+            'посты с комментариями в шарды их авторов, в том числе из '
+            'default при включении шардирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк копировать одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError('Шардирование выключено: POST_SHARDS пуст.')
+        self.chunk_size = options['chunk_size']
+        self.sources = list(dict.fromkeys(
+            [DEFAULT_DB_ALIAS, *settings.POST_SHARDS]))
+        for model in sharding.REFERENCE:
+            self.copy_references(model)
+        sharding.reserve_ids(self.last_id())
+        authors = posts = 0
+        for source in self.sources:
+            author_ids = list(
+                Post.objects.using(source).order_by()
+                .values_list('author_id', flat=True).distinct())
+            for author_id in author_ids:
+                target = sharding.shard_for(author_id)
+                if target != source:
+                    posts += self.move(author_id, source, target)
+                    authors += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено авторов: {authors}, постов: {posts}'))
+
+    def chunks(self, queryset):
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(
+                pk__gt=last_pk)
+            chunk = list(page.order_by('pk')[:self.chunk_size])
+            if not chunk:
+                return
+            last_pk = chunk[-1].pk
+            yield chunk
+
+    def copy_references(self, model):
+        fields = [field.name for field in model._meta.concrete_fields
+                  if not field.primary_key]
+        source = model._base_manager.using(DEFAULT_DB_ALIAS)
+        for chunk in self.chunks(source):
+            for shard in settings.POST_SHARDS:
+                manager = model._base_manager.using(shard)
+                existing = set(manager.filter(
+                    pk__in=[row.pk for row in chunk]
+                ).values_list('pk', flat=True))
+                manager.bulk_create(
+                    [row for row in chunk if row.pk not in existing])
+                manager.bulk_update(
+                    [row for row in chunk if row.pk in existing], fields)
+
+    def last_id(self):
+        return max(
+            model.objects.using(alias).aggregate(last=Max('pk'))['last'] or 0
+            for model in sharding.SHARDED for alias in self.sources)
+
+    def move(self, author_id, source, target):
+        """Переносит посты автора с комментариями; повторный запуск после
+        сбоя между фиксациями не создаёт дублей."""
+        posts = list(Post.objects.using(source).filter(author_id=author_id))
+        comments = list(Comment.objects.using(source).filter(
+            post__author_id=author_id))
+        with transaction.atomic(using=target), \
+                transaction.atomic(using=source):
+            Post.objects.using(target).bulk_create(
+                posts, batch_size=self.chunk_size, ignore_conflicts=True)
+            Comment.objects.using(target).bulk_create(
+                comments, batch_size=self.chunk_size, ignore_conflicts=True)
+            TimelineEntry.objects.using(source).filter(
+                author_id=author_id).delete()
+            with connections[source].cursor() as cursor:
+                for sql in DELETE_SQL:
+                    cursor.execute(sql.format(
+                        comment=Comment._meta.db_table,
+                        post=Post._meta.db_table,
+                    ), [author_id])
+        return len(posts)
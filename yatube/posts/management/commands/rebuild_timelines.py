@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает авторов с подтягиваемой лентой и пересобирает '
+            'материализованные ленты подписок пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать (по умолчанию все)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько пользователей обрабатывать в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        user_ids = list(users.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        timeline.classify_authors()
+        rows = 0
+        for start in range(0, len(user_ids), chunk_size):
+            rows += timeline.rebuild(user_ids[start:start + chunk_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}, записей: {rows}'))
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts import counters, sharding
+from posts.models import FeedCounter, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов в лентах (FeedCounter).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько групп или авторов пересчитывать за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.fixed = 0
+        self.reconcile({counters.ALL: sharding.count(Post.objects.all())})
+        self.recount(Group, 'group', counters.group_key)
+        self.recount(User, 'author', counters.author_key)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {self.fixed}'))
+
+    def recount(self, model, field, make_key):
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        while True:
+            chunk = list(ids.filter(pk__gt=last_pk)[:self.chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            actual = dict.fromkeys(chunk, 0)
+            # Посты группы лежат в разных шардах, поэтому суммы шардов
+            # складываются.
+            for part in sharding.scatter(
+                    Post.objects.filter(**{f'{field}_id__in': chunk})):
+                for pk, posts in (part.order_by().values(field)
+                                  .annotate(posts=Count('id'))
+                                  .values_list(field, 'posts')):
+                    actual[pk] += posts
+            self.reconcile({make_key(pk): value
+                            for pk, value in actual.items()})
+
+    @transaction.atomic
+    def reconcile(self, actual):
+        stored = dict(FeedCounter.objects.select_for_update().filter(
+            key__in=actual).values_list('key', 'value'))
+        stale = [
+            FeedCounter(key=key, value=value)
+            for key, value in actual.items()
+            if key in stored and stored[key] != value
+        ]
+        # Отсутствующие счётчики не создаются: они посчитаются
+        # при первом чтении ленты.
+        FeedCounter.objects.bulk_update(stale, ['value'])
+        self.fixed += len(stale)
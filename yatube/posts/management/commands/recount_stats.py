@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from posts import stats
+from posts.models import Post, ProfileStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики: ProfileStats '
+            'и Post.comment_count.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк пересчитывать за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        fixed = self.recount(User, self.fix_users)
+        # Посты и их комментарии лежат в шардах, если они включены.
+        for using in settings.POST_SHARDS or [DEFAULT_DB_ALIAS]:
+            fixed += self.recount(Post, self.fix_posts, using)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено строк: {fixed}'))
+
+    def recount(self, model, fix, using=DEFAULT_DB_ALIAS):
+        ids = model.objects.using(using).order_by('pk').values_list(
+            'pk', flat=True)
+        last_pk, fixed = 0, 0
+        while True:
+            chunk = list(ids.filter(pk__gt=last_pk)[:self.chunk_size])
+            if not chunk:
+                return fixed
+            last_pk = chunk[-1]
+            with transaction.atomic(using=using):
+                fixed += fix(chunk, using)
+
+    def fix_users(self, user_ids, using):
+        actual = stats.count_users(user_ids)
+        profiles = ProfileStats.objects.using(using)
+        stored = profiles.select_for_update().in_bulk(user_ids)
+        missing = [
+            ProfileStats(user_id=user_id, **actual[user_id])
+            for user_id in user_ids if user_id not in stored
+        ]
+        stale = [
+            row for row in stored.values()
+            if any(getattr(row, field) != value
+                   for field, value in actual[row.pk].items())
+        ]
+        for row in stale:
+            for field, value in actual[row.pk].items():
+                setattr(row, field, value)
+        profiles.bulk_create(missing, ignore_conflicts=True)
+        profiles.bulk_update(
+            stale, ['follower_count', 'following_count'])
+        return len(missing) + len(stale)
+
+    def fix_posts(self, post_ids, using):
+        actual = stats.count_comments(post_ids, using)
+        posts = Post.objects.using(using)
+        stale = [
+            Post(pk=pk, comment_count=actual[pk])
+            for pk, value in posts.select_for_update().filter(
+                pk__in=actual).values_list('pk', 'comment_count')
+            if value != actual[pk]
+        ]
+        posts.bulk_update(stale, ['comment_count'])
+        return len(stale)
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Лента подписок поддерживается триггерами, чтобы fan-out срабатывал
+# при любом способе записи, включая bulk_create и правки из админки.
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER posts_timeline_post_insert
+    AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_timelineentry (user_id, post_id, author_id, pub_date)
+        SELECT user_id, NEW.id, NEW.author_id, NEW.pub_date
+        FROM posts_follow WHERE author_id = NEW.author_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_timeline_follow_insert
+    AFTER INSERT ON posts_follow
+    BEGIN
+        INSERT OR IGNORE INTO posts_timelineentry
+            (user_id, post_id, author_id, pub_date)
+        SELECT NEW.user_id, id, author_id, pub_date
+        FROM posts_post WHERE author_id = NEW.author_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_timeline_follow_delete
+    AFTER DELETE ON posts_follow
+    BEGIN
+        DELETE FROM posts_timelineentry
+        WHERE user_id = OLD.user_id AND author_id = OLD.author_id;
+    END;
+    """,
+]
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_timeline_post_insert;',
+    'DROP TRIGGER IF EXISTS posts_timeline_follow_insert;',
+    'DROP TRIGGER IF EXISTS posts_timeline_follow_delete;',
+]
+
+BACKFILL = """
+    INSERT OR IGNORE INTO posts_timelineentry
+        (user_id, post_id, author_id, pub_date)
+    SELECT f.user_id, p.id, p.author_id, p.pub_date
+    FROM posts_follow f JOIN posts_post p ON p.author_id = f.author_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_auto_20261017_0324'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
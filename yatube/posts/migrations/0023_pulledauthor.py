@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-17 03:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0022_timeline_triggers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PulledAuthor',
+            fields=[
+                ('author', models.OneToOneField(help_text='Автор, посты которого подтягиваются при чтении ленты', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pulled_feed', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор постов')),
+            ],
+            options={
+                'verbose_name': 'Автор с подтягиваемой лентой',
+                'verbose_name_plural': 'Авторы с подтягиваемой лентой',
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Посты и подписки авторов из posts_pulledauthor в ленты не пишутся:
+# они подмешиваются при чтении.
+CREATE_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_timeline_post_insert;',
+    'DROP TRIGGER IF EXISTS posts_timeline_follow_insert;',
+    """
+    CREATE TRIGGER posts_timeline_post_insert
+    AFTER INSERT ON posts_post
+    WHEN NOT EXISTS (
+        SELECT 1 FROM posts_pulledauthor WHERE author_id = NEW.author_id
+    )
+    BEGIN
+        INSERT INTO posts_timelineentry (user_id, post_id, author_id, pub_date)
+        SELECT user_id, NEW.id, NEW.author_id, NEW.pub_date
+        FROM posts_follow WHERE author_id = NEW.author_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_timeline_follow_insert
+    AFTER INSERT ON posts_follow
+    WHEN NOT EXISTS (
+        SELECT 1 FROM posts_pulledauthor WHERE author_id = NEW.author_id
+    )
+    BEGIN
+        INSERT OR IGNORE INTO posts_timelineentry
+            (user_id, post_id, author_id, pub_date)
+        SELECT NEW.user_id, id, author_id, pub_date
+        FROM posts_post WHERE author_id = NEW.author_id;
+    END;
+    """,
+]
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_timeline_post_insert;',
+    'DROP TRIGGER IF EXISTS posts_timeline_follow_insert;',
+    """
+    CREATE TRIGGER posts_timeline_post_insert
+    AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_timelineentry (user_id, post_id, author_id, pub_date)
+        SELECT user_id, NEW.id, NEW.author_id, NEW.pub_date
+        FROM posts_follow WHERE author_id = NEW.author_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_timeline_follow_insert
+    AFTER INSERT ON posts_follow
+    BEGIN
+        INSERT OR IGNORE INTO posts_timelineentry
+            (user_id, post_id, author_id, pub_date)
+        SELECT NEW.user_id, id, author_id, pub_date
+        FROM posts_post WHERE author_id = NEW.author_id;
+    END;
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_pulledauthor'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
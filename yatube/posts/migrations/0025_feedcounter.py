@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_timeline_skip_pulled_authors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCounter',
+            fields=[
+                ('key', models.CharField(help_text='Ключ ленты, для которой хранится счётчик', max_length=64, primary_key=True, serialize=False, verbose_name='Лента')),
+                ('value', models.IntegerField(default=0, help_text='Сколько постов в ленте', verbose_name='Число постов')),
+            ],
+            options={
+                'verbose_name': 'Счётчик ленты',
+                'verbose_name_plural': 'Счётчики лент',
+            },
+        ),
+    ]
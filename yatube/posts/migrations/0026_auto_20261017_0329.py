@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-17 03:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from ._triggers import CREATE_TIMELINE_TRIGGERS, DROP_TIMELINE_TRIGGERS
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0025_feedcounter'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_TIMELINE_TRIGGERS, CREATE_TIMELINE_TRIGGERS),
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Пользователь, для которого ведутся счётчики', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('post_count', models.PositiveIntegerField(default=0, help_text='Сколько постов опубликовал пользователь', verbose_name='Число постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, help_text='Сколько пользователей подписаны на автора', verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, help_text='На скольких авторов подписан пользователь', verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика профиля',
+                'verbose_name_plural': 'Статистика профилей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Поддерживается сигналами, см. posts.stats', verbose_name='Число постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Поддерживается сигналами, см. posts.stats', verbose_name='Число комментариев'),
+        ),
+        migrations.RunSQL(CREATE_TIMELINE_TRIGGERS, DROP_TIMELINE_TRIGGERS),
+    ]
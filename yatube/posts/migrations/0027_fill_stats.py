@@ -0,0 +1,34 @@
+from django.db import migrations
+
+FILL_STATS = [
+    """
+    UPDATE posts_group SET post_count = (
+        SELECT COUNT(*) FROM posts_post WHERE group_id = posts_group.id
+    );
+    """,
+    """
+    UPDATE posts_post SET comment_count = (
+        SELECT COUNT(*) FROM posts_comment WHERE post_id = posts_post.id
+    );
+    """,
+    """
+    INSERT INTO posts_profilestats
+        (user_id, post_count, follower_count, following_count)
+    SELECT u.id,
+        (SELECT COUNT(*) FROM posts_post WHERE author_id = u.id),
+        (SELECT COUNT(*) FROM posts_follow WHERE author_id = u.id),
+        (SELECT COUNT(*) FROM posts_follow WHERE user_id = u.id)
+    FROM auth_user u;
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_auto_20261017_0329'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FILL_STATS, migrations.RunSQL.noop),
+    ]
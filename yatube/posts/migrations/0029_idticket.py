@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_auto_20261017_0336'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdTicket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Номер поста или комментария',
+                'verbose_name_plural': 'Номера постов и комментариев',
+            },
+        ),
+    ]
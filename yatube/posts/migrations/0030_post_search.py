@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from ._triggers import (CREATE_SEARCH_TRIGGERS, DROP_SEARCH_TRIGGERS,
+                        REBUILD_SEARCH_INDEX)
+
+# Полнотекстовый индекс постов (см. posts.search). unicode61 приводит
+# к одному регистру и кириллицу, в отличие от LIKE в SQLite; префиксные
+# индексы ускоряют запросы вида «пост*».
+CREATE_INDEX = """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    );
+"""
+
+DROP_INDEX = 'DROP TABLE IF EXISTS posts_post_fts;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_idticket'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+        migrations.RunSQL(REBUILD_SEARCH_INDEX, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_SEARCH_TRIGGERS, DROP_SEARCH_TRIGGERS),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:13
+
+from django.db import migrations, models
+
+from ._triggers import (CREATE_SEARCH_TRIGGERS, CREATE_TIMELINE_TRIGGERS,
+                        DROP_SEARCH_TRIGGERS, DROP_TIMELINE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0030_post_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_TIMELINE_TRIGGERS, CREATE_TIMELINE_TRIGGERS),
+        migrations.RunSQL(DROP_SEARCH_TRIGGERS, CREATE_SEARCH_TRIGGERS),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_height',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Высота миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, editable=False, help_text='Строится при загрузке картинки, см. posts.images', max_length=255, verbose_name='Адрес миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_width',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Ширина миниатюры'),
+        ),
+        migrations.RunSQL(CREATE_SEARCH_TRIGGERS, DROP_SEARCH_TRIGGERS),
+        migrations.RunSQL(CREATE_TIMELINE_TRIGGERS, DROP_TIMELINE_TRIGGERS),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:20
+
+from django.db import migrations, models
+
+from ._triggers import (CREATE_SEARCH_TRIGGERS, CREATE_TIMELINE_TRIGGERS,
+                        DROP_SEARCH_TRIGGERS, DROP_TIMELINE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0031_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_TIMELINE_TRIGGERS, CREATE_TIMELINE_TRIGGERS),
+        migrations.RunSQL(DROP_SEARCH_TRIGGERS, CREATE_SEARCH_TRIGGERS),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_srcset',
+            field=models.TextField(blank=True, editable=False, help_text='Значение srcset в формате исходной картинки', verbose_name='Варианты миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_webp_srcset',
+            field=models.TextField(blank=True, editable=False, verbose_name='Варианты миниатюры в WebP'),
+        ),
+        migrations.RunSQL(CREATE_SEARCH_TRIGGERS, DROP_SEARCH_TRIGGERS),
+        migrations.RunSQL(CREATE_TIMELINE_TRIGGERS, DROP_TIMELINE_TRIGGERS),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+from ._triggers import (CREATE_SEARCH_TRIGGERS, CREATE_TIMELINE_TRIGGERS,
+                        DROP_SEARCH_TRIGGERS, DROP_TIMELINE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0032_post_thumbnail_srcset'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_TIMELINE_TRIGGERS, CREATE_TIMELINE_TRIGGERS),
+        migrations.RunSQL(DROP_SEARCH_TRIGGERS, CREATE_SEARCH_TRIGGERS),
+        migrations.AddField(
+            model_name='post',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Размытое превью в data-адресе, см. posts.images', verbose_name='Заполнитель картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='placeholder_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет картинки'),
+        ),
+        migrations.RunSQL(CREATE_SEARCH_TRIGGERS, DROP_SEARCH_TRIGGERS),
+        migrations.RunSQL(CREATE_TIMELINE_TRIGGERS, DROP_TIMELINE_TRIGGERS),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0033_post_placeholder'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='group',
+            name='post_count',
+        ),
+        migrations.RemoveField(
+            model_name='profilestats',
+            name='post_count',
+        ),
+    ]
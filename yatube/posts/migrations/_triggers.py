@@ -0,0 +1,99 @@
+"""SQL триггеров ленты подписок и поискового индекса для миграций.
+
+SQLite пересоздаёт таблицу при AddField/AlterField, и триггеры, которые
+на неё ссылаются, при этом ломаются, а триггеры самой таблицы пропадают.
+Миграции, меняющие posts_post или posts_follow, должны снять триггеры
+в начале и поставить их обратно в конце:
+
+    migrations.RunSQL(DROP_TIMELINE_TRIGGERS, CREATE_TIMELINE_TRIGGERS),
+    migrations.RunSQL(DROP_SEARCH_TRIGGERS, CREATE_SEARCH_TRIGGERS),
+    ...
+    migrations.RunSQL(CREATE_SEARCH_TRIGGERS, DROP_SEARCH_TRIGGERS),
+    migrations.RunSQL(CREATE_TIMELINE_TRIGGERS, DROP_TIMELINE_TRIGGERS),
+
+Если при этом меняется текст постов, индекс нужно пересобрать:
+``migrations.RunSQL(REBUILD_SEARCH_INDEX, migrations.RunSQL.noop)``.
+
+Модуль начинается с подчёркивания, поэтому загрузчик миграций его
+пропускает.
+"""
+
+CREATE_TIMELINE_TRIGGERS = [
+    """
+    CREATE TRIGGER posts_timeline_post_insert
+    AFTER INSERT ON posts_post
+    WHEN NOT EXISTS (
+        SELECT 1 FROM posts_pulledauthor WHERE author_id = NEW.author_id
+    )
+    BEGIN
+        INSERT INTO posts_timelineentry (user_id, post_id, author_id, pub_date)
+        SELECT user_id, NEW.id, NEW.author_id, NEW.pub_date
+        FROM posts_follow WHERE author_id = NEW.author_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_timeline_follow_insert
+    AFTER INSERT ON posts_follow
+    WHEN NOT EXISTS (
+        SELECT 1 FROM posts_pulledauthor WHERE author_id = NEW.author_id
+    )
+    BEGIN
+        INSERT OR IGNORE INTO posts_timelineentry
+            (user_id, post_id, author_id, pub_date)
+        SELECT NEW.user_id, id, author_id, pub_date
+        FROM posts_post WHERE author_id = NEW.author_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_timeline_follow_delete
+    AFTER DELETE ON posts_follow
+    BEGIN
+        DELETE FROM posts_timelineentry
+        WHERE user_id = OLD.user_id AND author_id = OLD.author_id;
+    END;
+    """,
+]
+
+DROP_TIMELINE_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_timeline_post_insert;',
+    'DROP TRIGGER IF EXISTS posts_timeline_follow_insert;',
+    'DROP TRIGGER IF EXISTS posts_timeline_follow_delete;',
+]
+
+# Индекс posts_post_fts хранит только термы (content='posts_post'), поэтому
+# при удалении и правке ему передаётся старый текст.
+CREATE_SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER posts_search_post_insert
+    AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts (rowid, text) VALUES (NEW.id, NEW.text);
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_search_post_delete
+    AFTER DELETE ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', OLD.id, OLD.text);
+    END;
+    """,
+    """
+    CREATE TRIGGER posts_search_post_update
+    AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', OLD.id, OLD.text);
+        INSERT INTO posts_post_fts (rowid, text) VALUES (NEW.id, NEW.text);
+    END;
+    """,
+]
+
+DROP_SEARCH_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_search_post_insert;',
+    'DROP TRIGGER IF EXISTS posts_search_post_delete;',
+    'DROP TRIGGER IF EXISTS posts_search_post_update;',
+]
+
+REBUILD_SEARCH_INDEX = (
+    "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild');")
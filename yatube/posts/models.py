@@ -4,6 +4,17 @@ from django.db import models
 User = get_user_model()
 
 
+class ShardedQuerySet(models.QuerySet):
+    """create() без явной базы отдаёт выбор роутеру вместе с объектом,
+    как save(): так пост попадает в шард автора (см. posts.sharding)."""
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
 class Group(models.Model):
     title = models.CharField(
         verbose_name="Название",
@@ -58,9 +69,65 @@ class Post(models.Model):
         verbose_name="Картинка",
         help_text="Картинка, которая будет прикреплена к посту"
     )
+    thumbnail_url = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name="Адрес миниатюры",
+        help_text="Строится при загрузке картинки, см. posts.images"
+    )
+    thumbnail_width = models.PositiveSmallIntegerField(
+        null=True,
+        editable=False,
+        verbose_name="Ширина миниатюры"
+    )
+    thumbnail_height = models.PositiveSmallIntegerField(
+        null=True,
+        editable=False,
+        verbose_name="Высота миниатюры"
+    )
+    thumbnail_srcset = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Варианты миниатюры",
+        help_text="Значение srcset в формате исходной картинки"
+    )
+    thumbnail_webp_srcset = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Варианты миниатюры в WebP"
+    )
+    placeholder_color = models.CharField(
+        max_length=7,
+        blank=True,
+        editable=False,
+        verbose_name="Основной цвет картинки"
+    )
+    placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Заполнитель картинки",
+        help_text="Размытое превью в data-адресе, см. posts.images"
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число комментариев",
+        help_text="Поддерживается сигналами, см. posts.stats"
+    )
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -94,6 +161,15 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('created', 'id')
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.text
 
@@ -123,3 +199,145 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_following'),
         ]
+        indexes = [
+            # Подписчики автора: рассылка в ленты и счётчики подписчиков.
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок пользователя.
+
+    Строки добавляются триггерами базы при публикации поста автора
+    (fan-out on write) и при подписке, удаляются при отписке, поэтому
+    follow_index читает ленту одним проходом по индексу (user, pub_date).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='timeline',
+        verbose_name="Подписчик",
+        help_text="Пользователь, в ленту которого попал пост"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name="Пост",
+        help_text="Пост автора, на которого подписан пользователь"
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Автор постов",
+        help_text="Автор поста, нужен для очистки ленты при отписке"
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации",
+        help_text="Копия даты публикации поста для сортировки ленты"
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+
+
+class PulledAuthor(models.Model):
+    """Автор с большим числом подписчиков.
+
+    Его посты не рассылаются по лентам подписчиков, а подмешиваются
+    в ленту при чтении (см. posts.timeline.follow_feed).
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pulled_feed',
+        verbose_name="Автор постов",
+        help_text="Автор, посты которого подтягиваются при чтении ленты"
+    )
+
+    class Meta:
+        verbose_name = 'Автор с подтягиваемой лентой'
+        verbose_name_plural = 'Авторы с подтягиваемой лентой'
+
+
+class FeedCounter(models.Model):
+    """Число постов в ленте, поддерживаемое сигналами (см. posts.counters).
+
+    Ключи: ``all``, ``group:<id>``, ``author:<id>``.
+    """
+    key = models.CharField(
+        primary_key=True,
+        max_length=64,
+        verbose_name="Лента",
+        help_text="Ключ ленты, для которой хранится счётчик"
+    )
+    value = models.IntegerField(
+        default=0,
+        verbose_name="Число постов",
+        help_text="Сколько постов в ленте"
+    )
+
+    class Meta:
+        verbose_name = 'Счётчик ленты'
+        verbose_name_plural = 'Счётчики лент'
+
+    def __str__(self) -> str:
+        return f'{self.key}={self.value}'
+
+
+class ProfileStats(models.Model):
+    """Денормализованные счётчики пользователя для профиля и карточек."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Пользователь",
+        help_text="Пользователь, для которого ведутся счётчики"
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Число подписчиков",
+        help_text="Сколько пользователей подписаны на автора"
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Число подписок",
+        help_text="На скольких авторов подписан пользователь"
+    )
+
+    class Meta:
+        verbose_name = 'Статистика профиля'
+        verbose_name_plural = 'Статистика профилей'
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class IdTicket(models.Model):
+    """Источник первичных ключей постов и комментариев при шардировании.
+
+    Каждый шард нумеровал бы строки сам, и ключи совпали бы между
+    шардами; номер берётся из этой таблицы в основной базе (см.
+    posts.sharding.next_id).
+    """
+
+    class Meta:
+        verbose_name = 'Номер поста или комментария'
+        verbose_name_plural = 'Номера постов и комментариев'
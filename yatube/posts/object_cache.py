@@ -0,0 +1,207 @@
+"""Кэш горячих объектов: постов по id, групп по slug, пользователей
+по username.
+
+Объект лежит в кэше под ключом первичного ключа, а натуральный ключ
+(``Group.slug``, ``User.username``) указывает на первичный ключ. Поэтому
+после переименования старый slug не отдаёт объект: он ведёт на запись, у
+которой slug уже другой, и чтение идёт в базу. Пост хранится без
+связанных объектов, автор и группа подставляются из своих записей кэша,
+так что правка группы или вход автора не оставляют в постах устаревших
+копий.
+
+Записи удаляются сигналами (posts.signals) при сохранении и удалении
+объектов и ещё раз после фиксации транзакции, чтобы параллельный запрос
+не вернул в кэш версию до записи. Объекты, прочитанные внутри
+транзакции, кладутся в кэш только после её фиксации. Запись в обход
+сигналов (update(), bulk_create) видна не позже чем через
+``OBJECT_CACHE_TIMEOUT`` секунд, migrate и flush очищают кэш целиком.
+
+Промах тоже кэшируется: на ключ несуществующего поста, slug или
+username на ``NEGATIVE_CACHE_TIMEOUT`` секунд кладётся метка MISSING, и
+повторные запросы сканеров отвечают 404 без обращения к базе. Создание
+объекта с этим ключом удаляет метку тем же сигналом.
+
+``hits`` и ``misses`` считают обращения по моделям в пределах процесса,
+``negative_hits`` — ответы по меткам MISSING.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import Http404
+
+from core.routers import use_primary
+
+from . import sharding
+from .models import Group, Post
+
+User = get_user_model()
+
+NATURAL_KEYS = {
+    Group: 'slug',
+    User: 'username',
+}
+
+# Поля, которые читают страницы. Хэш пароля, почта и флаги пользователя
+# не попадают в общий кэш, который может лежать файлом на диске
+# (core.cache.SQLiteCache).
+CACHED_FIELDS = {
+    User: ('id', 'username', 'first_name', 'last_name'),
+}
+
+MISSING = 'missing'
+
+hits = Counter()
+misses = Counter()
+negative_hits = Counter()
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _pk_key(model, pk):
+    return f'obj:{_label(model)}:pk:{pk}'
+
+
+def _natural_key(model, value):
+    return f'obj:{_label(model)}:{NATURAL_KEYS[model]}:{value}'
+
+
+def _set_many(values, timeout):
+    if connection.in_atomic_block:
+        # Прочитанное внутри транзакции может измениться при её откате,
+        # поэтому в кэш попадает только после фиксации.
+        transaction.on_commit(lambda: cache.set_many(values, timeout))
+    else:
+        cache.set_many(values, timeout)
+
+
+def _store(instance):
+    model = type(instance)
+    values = {_pk_key(model, instance.pk): instance}
+    if model in NATURAL_KEYS:
+        values[_natural_key(
+            model, getattr(instance, NATURAL_KEYS[model]))] = instance.pk
+    _set_many(values, settings.OBJECT_CACHE_TIMEOUT)
+
+
+def _store_missing(key):
+    _set_many({key: MISSING}, settings.NEGATIVE_CACHE_TIMEOUT)
+
+
+def _load(model, **lookup):
+    # Пост кэшируется без связанных объектов, поэтому select_related
+    # из Meta или менеджера здесь не нужен. Объект для кэша читается из
+    # основной базы, а не из отстающей реплики.
+    queryset = model._default_manager.filter(**lookup)
+    if model in CACHED_FIELDS:
+        queryset = queryset.only(*CACHED_FIELDS[model])
+    with use_primary():
+        return sharding.first(queryset)
+
+
+def get_by_pk(model, pk):
+    """Объект по первичному ключу или None."""
+    key = _pk_key(model, pk)
+    instance = cache.get(key)
+    if instance == MISSING:
+        negative_hits[_label(model)] += 1
+        return None
+    if instance is not None:
+        hits[_label(model)] += 1
+        return instance
+    misses[_label(model)] += 1
+    instance = _load(model, pk=pk)
+    if instance is None:
+        _store_missing(key)
+    else:
+        _store(instance)
+    return instance
+
+
+def get_by_natural_key(model, value):
+    """Объект по натуральному ключу из NATURAL_KEYS или None."""
+    field = NATURAL_KEYS[model]
+    key = _natural_key(model, value)
+    pk = cache.get(key)
+    if pk == MISSING:
+        negative_hits[_label(model)] += 1
+        return None
+    if pk is not None:
+        instance = cache.get(_pk_key(model, pk))
+        if (instance is not None and instance != MISSING
+                and getattr(instance, field) == value):
+            hits[_label(model)] += 1
+            return instance
+    misses[_label(model)] += 1
+    instance = _load(model, **{field: value})
+    if instance is None:
+        _store_missing(key)
+    else:
+        _store(instance)
+    return instance
+
+
+def get_post(pk):
+    """Пост с автором и группой из кэша или None."""
+    post = get_by_pk(Post, pk)
+    if post is None:
+        return None
+    post.author = get_by_pk(User, post.author_id)
+    if post.group_id is not None:
+        post.group = get_by_pk(Group, post.group_id)
+    return post
+
+
+def _or_404(instance):
+    if instance is None:
+        raise Http404
+    return instance
+
+
+def get_post_or_404(pk):
+    return _or_404(get_post(pk))
+
+
+def get_group_or_404(slug):
+    return _or_404(get_by_natural_key(Group, slug))
+
+
+def get_user_or_404(username):
+    return _or_404(get_by_natural_key(User, username))
+
+
+def forget(model, pk, natural_value=None):
+    """Удаляет объект и метки промаха его ключей из кэша сейчас и после
+    фиксации транзакции.
+
+    Запись старого натурального ключа не трогаем: без записи первичного
+    ключа она не даёт попадания.
+    """
+    keys = [_pk_key(model, pk)]
+    if natural_value is not None:
+        keys.append(_natural_key(model, natural_value))
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_instance(instance):
+    model = type(instance)
+    field = NATURAL_KEYS.get(model)
+    forget(model, instance.pk,
+           getattr(instance, field) if field is not None else None)
+
+
+def hit_ratio(model=None):
+    """Доля попаданий по модели или по всем моделям; None без
+    обращений."""
+    if model is None:
+        found, missed = sum(hits.values()), sum(misses.values())
+    else:
+        found, missed = hits[_label(model)], misses[_label(model)]
+    if not found + missed:
+        return None
+    return found / (found + missed)
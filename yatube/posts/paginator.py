@@ -0,0 +1,220 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPage(Sequence):
+    """Страница ленты, построенная по курсору, а не по номеру."""
+
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, cursor,
+                 has_next, has_previous, values=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.values = values
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Cursor page {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        # Используется как часть ключа кэша вместо номера страницы.
+        return self.cursor or 1
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _neighbour(self, index, direction):
+        if self.object_list:
+            return self.paginator.cursor_for(self.object_list[index],
+                                             direction)
+        # Курсор за концом ленты или после удаления его записей: соседняя
+        # страница ищется от значений самого курсора.
+        return self.paginator.encode_cursor(direction, self.values)
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self._neighbour(-1, NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self._neighbour(0, PREVIOUS)
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу сортировки (keyset pagination).
+
+    Вместо ``OFFSET n LIMIT k`` и ``COUNT(*)`` каждая страница ищется
+    условием ``(pub_date, id) < (значения последней записи)``, поэтому
+    время выборки не зависит от глубины страницы. Курсоры непрозрачны
+    для клиента: это base64 от направления и значений ключа.
+
+    По умолчанию ключ берётся из сортировки самой выборки; в нём могут быть
+    и аннотации, как в ленте подписок (posts.timeline.FEED_ORDERING).
+    """
+
+    def __init__(self, object_list, per_page, ordering=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        if ordering is None:
+            ordering = (object_list.query.order_by
+                        or object_list.model._meta.ordering)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+    def cursor_for(self, obj, direction=NEXT):
+        return self.encode_cursor(
+            direction, [getattr(obj, name) for name in self.fields])
+
+    def encode_cursor(self, direction, values):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+        raw = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения) или None для плохого курсора."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *raw_values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+            if (direction not in (NEXT, PREVIOUS)
+                    or len(raw_values) != len(self.fields)):
+                return None
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, raw_values)
+            ]
+        except (ValueError, TypeError, binascii.Error):
+            return None
+        return direction, values
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу; некорректный курсор ведёт на первую."""
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            rows = list(self._ordered(forward=True)[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, None,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=False)
+        direction, values = decoded
+        forward = direction == NEXT
+        queryset = self._ordered(forward).filter(self._seek(values, forward))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return CursorPage(rows, self, cursor, has_next=has_more,
+                              has_previous=True, values=values)
+        rows.reverse()
+        return CursorPage(rows, self, cursor, has_next=True,
+                          has_previous=has_more, values=values)
+
+    def _field(self, name):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _ordered(self, forward):
+        if forward:
+            return self.object_list.order_by(*self.ordering)
+        return self.object_list.order_by(*(
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ))
+
+    def _seek(self, values, forward):
+        # Лексикографическое сравнение кортежа ключей:
+        # (a < x) OR (a = x AND b < y) OR ...
+        # Избыточное условие a <= x позволяет SQLite начать обход индекса
+        # сразу с курсора, а не отбрасывать все предыдущие строки.
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.fields, values):
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+
+class CountedPaginator(Paginator):
+    """Нумерованные страницы с общим числом записей из счётчика
+    (см. posts.counters), а не из COUNT(*) по выборке.
+
+    Вместо полного page_range шаблону отдаётся окно номеров вокруг
+    текущей страницы, чтобы размер навигации не рос с числом постов.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is None:
+            return super().count
+        return self._count()
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц: on_ends с каждого края, on_each_side вокруг
+        number, пропуски заменены на ELLIPSIS. Повторяет API
+        Paginator.get_elided_page_range из Django 3.2."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number))
+        return page
@@ -0,0 +1,182 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс — виртуальная таблица FTS5 ``posts_post_fts`` с внешним
+содержимым: в ней хранятся только термы, текст читается из
+``posts_post``. Индекс обновляют триггеры базы из миграции
+``0030_post_search``, поэтому он не отстаёт при любом способе записи:
+bulk_create, правки из админки, перенос постов между шардами.
+
+Запрос пользователя не передаётся в MATCH как есть: из него берутся
+слова, и каждое ищется как префикс (``"слово"*``), все слова
+обязательны. Так синтаксис FTS5 в запросе не ломает поиск, а слово
+находится и с другими окончаниями.
+
+Результаты упорядочены по BM25 (``bm25()`` тем меньше, чем релевантнее
+пост), при равном ранге новые первыми, и листаются курсором по паре
+(ранг, id) без OFFSET. Ранг зависит от статистики всего индекса, поэтому
+пост, добавленный между страницами, может сдвинуть границу страницы на
+несколько позиций. При шардировании поиск идёт в каждом шарде и
+результаты сливаются по рангу; фильтр по автору оставляет один шард.
+"""
+import base64
+import binascii
+import heapq
+import json
+import re
+from collections.abc import Sequence
+from itertools import islice
+
+from django.db import connections
+
+from . import sharding
+from .cards import FeedQuery
+from .models import Post
+
+INDEX = 'posts_post_fts'
+# Слова сверх этого числа отбрасываются: каждое слово — отдельный обход
+# индекса.
+MAX_TERMS = 8
+
+SEARCH_SQL = """
+    SELECT bm25({index}) AS score, post.id
+    FROM {index} JOIN {post} AS post ON post.id = {index}.rowid
+    WHERE {index} MATCH %s{filters}
+    ORDER BY score, post.id DESC
+    LIMIT %s
+"""
+
+MATCH_SQL = 'SELECT rowid FROM {index} WHERE {index} MATCH %s'
+
+_WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Выражение MATCH из пользовательского запроса; None, если в нём
+    нет слов."""
+    terms = _WORD.findall(query.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def filter_queryset(queryset, query):
+    """Посты выборки, подходящие под запрос, без ранжирования: поиск
+    в админке."""
+    match = match_expression(query)
+    if match is None:
+        return queryset.none()
+    # pk__in=RawSQL(...) дал бы IN ((SELECT ...)), а это в SQLite
+    # скалярный подзапрос: только первая найденная строка.
+    return queryset.extra(
+        where=[f'"{Post._meta.db_table}"."id" IN '
+               f'({MATCH_SQL.format(index=INDEX)})'],
+        params=[match])
+
+
+def encode_cursor(score, post_id):
+    raw = json.dumps([score, post_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(ранг, id) из курсора или None для пустого и плохого курсора."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, post_id = json.loads(base64.urlsafe_b64decode(
+            padded.encode()))
+        return float(score), int(post_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+class SearchPage(Sequence):
+    """Страница результатов: карточки постов в порядке ранга."""
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f'<Search page {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _search(alias, match, filters, after, limit):
+    """Тройки (ранг, id, база) из индекса одной базы."""
+    conditions, params = [], [match]
+    for column, value in filters.items():
+        conditions.append(f'post.{column} = %s')
+        params.append(value)
+    if after is not None:
+        score, post_id = after
+        conditions.append(
+            f'(bm25({INDEX}) > %s OR (bm25({INDEX}) = %s AND post.id < %s))')
+        params.extend((score, score, post_id))
+    sql = SEARCH_SQL.format(
+        index=INDEX,
+        post=Post._meta.db_table,
+        filters=''.join(f' AND {condition}' for condition in conditions),
+    )
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [(score, post_id, alias) for score, post_id in cursor]
+
+
+def _databases(author_id):
+    if author_id is not None and sharding.enabled():
+        return [sharding.shard_for(author_id)]
+    return [part.db for part in sharding.scatter(Post.objects.all())]
+
+
+def _cards(hits):
+    by_alias = {}
+    for _, post_id, alias in hits:
+        by_alias.setdefault(alias, []).append(post_id)
+    cards = {}
+    for alias, ids in by_alias.items():
+        for card in FeedQuery(Post.objects.using(alias).filter(pk__in=ids)):
+            cards[card.id] = card
+    # Пост мог быть удалён между поиском и чтением карточек.
+    return [cards[post_id] for _, post_id, _ in hits if post_id in cards]
+
+
+def find(query, per_page, author_id=None, group_id=None, cursor=None):
+    """Страница постов под запрос, самые релевантные первыми."""
+    match = match_expression(query)
+    if match is None:
+        return SearchPage([], None, None)
+    filters = {}
+    if author_id is not None:
+        filters['author_id'] = author_id
+    if group_id is not None:
+        filters['group_id'] = group_id
+    after = decode_cursor(cursor)
+    if after is None:
+        cursor = None
+    streams = [_search(alias, match, filters, after, per_page + 1)
+               for alias in _databases(author_id)]
+    hits = list(islice(
+        heapq.merge(*streams, key=lambda hit: (hit[0], -hit[1])),
+        per_page + 1))
+    next_cursor = None
+    if len(hits) > per_page:
+        hits = hits[:per_page]
+        next_cursor = encode_cursor(*hits[-1][:2])
+    return SearchPage(_cards(hits), cursor, next_cursor)
@@ -0,0 +1,192 @@
+"""Шардирование постов и комментариев по авторам.
+
+Режим включается списком псевдонимов баз в ``POST_SHARDS``; пустой
+список оставляет всё в ``default``. Пост хранится в шарде своего автора
+(``shard_for``), комментарий — в шарде поста, поэтому профиль и страница
+поста читают один шард, а главная, группы и лента подписок собираются
+из всех шардов слиянием по дате публикации (``posts``,
+``follow_feed``).
+
+Шард выбирается рендеву-хешированием: при добавлении шарда в него
+переезжает примерно 1/N авторов, остальные остаются на месте. Переносит
+данные команда ``rebalance_shards``.
+
+Пользователи и группы живут в ``default``, а в шарды копируются сигналами
+(``copy_reference``), чтобы внешние ключи и соединения в запросах карточек
+работали внутри шарда. Подписки, счётчики и лента ``TimelineEntry``
+остаются в ``default``; лента подписок в этом режиме не материализуется,
+а подтягивается из шардов при чтении. Первичные ключи постов и
+комментариев выдаёт ``IdTicket``, чтобы они не пересекались между
+шардами и не менялись при переносе.
+"""
+import hashlib
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from .models import Comment, Follow, Group, IdTicket, Post
+from .timeline import FEED_ORDERING, MergedFeed, follow_feed as _follow_feed
+
+User = get_user_model()
+
+SHARDED = (Post, Comment)
+REFERENCE = (User, Group)
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def _weight(shard, author_id):
+    digest = hashlib.blake2b(f'{shard}:{author_id}'.encode(),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def shard_for(author_id, shards=None):
+    """Шард автора: тот, у которого наибольший вес пары
+    (шард, автор)."""
+    shards = settings.POST_SHARDS if shards is None else shards
+    return max(shards, key=lambda shard: _weight(shard, author_id))
+
+
+def next_id():
+    """Новый первичный ключ поста или комментария."""
+    manager = IdTicket.objects.using(DEFAULT_DB_ALIAS)
+    ticket = manager.create()
+    # Последовательность AUTOINCREMENT не переиспользует номера, поэтому
+    # старые строки не нужны.
+    manager.filter(pk__lt=ticket.pk).delete()
+    return ticket.pk
+
+
+def atomic(author_id):
+    """Транзакция в шарде автора для записывающих представлений: вместе
+    с их транзакцией в ``default`` пост или комментарий откатывается
+    заодно со счётчиками. Без шардов — пустой контекст."""
+    if not enabled():
+        return nullcontext()
+    return transaction.atomic(using=shard_for(author_id))
+
+
+def reserve_ids(last_id):
+    """Следующие номера будут больше last_id."""
+    manager = IdTicket.objects.using(DEFAULT_DB_ALIAS)
+    current = manager.order_by('-pk').values_list('pk', flat=True).first()
+    if current is None or current < last_id:
+        manager.create(pk=last_id)
+
+
+def scatter(queryset):
+    """Та же выборка в каждом шарде; для нешардированных моделей или без
+    шардов — она сама."""
+    if not enabled() or queryset.model not in SHARDED:
+        return [queryset]
+    return [queryset.using(shard) for shard in settings.POST_SHARDS]
+
+
+def count(queryset):
+    return sum(part.count() for part in scatter(queryset))
+
+
+def first(queryset):
+    """Первый объект выборки из первого шарда, где он нашёлся."""
+    for part in scatter(queryset):
+        instance = part.first()
+        if instance is not None:
+            return instance
+    return None
+
+
+def posts(queryset):
+    """Посты выборки из всех шардов, слитые по порядку сортировки."""
+    parts = scatter(queryset)
+    if len(parts) == 1:
+        return parts[0]
+    return MergedFeed(parts, queryset.query.order_by or Post._meta.ordering)
+
+
+def follow_feed(user):
+    """Лента подписок: из ``TimelineEntry`` или, при шардировании,
+    постами авторов из их шардов."""
+    if not enabled():
+        return _follow_feed(user)
+    by_shard = {}
+    for author_id in Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True):
+        by_shard.setdefault(shard_for(author_id), []).append(author_id)
+    streams = [
+        Post.objects.using(shard).filter(author_id__in=author_ids).annotate(
+            feed_date=F('pub_date'), feed_id=F('id'),
+        ).order_by(*FEED_ORDERING)
+        for shard, author_ids in sorted(by_shard.items())
+    ]
+    if len(streams) == 1:
+        return streams[0]
+    if not streams:
+        return Post.objects.none()
+    return MergedFeed(streams, FEED_ORDERING)
+
+
+def _reference_values(instance):
+    return {field.attname: getattr(instance, field.attname)
+            for field in type(instance)._meta.concrete_fields
+            if not field.primary_key}
+
+
+def copy_reference(instance, shards=None):
+    """Копирует пользователя или группу во все шарды без сигналов."""
+    model = type(instance)
+    values = _reference_values(instance)
+    for shard in settings.POST_SHARDS if shards is None else shards:
+        manager = model._base_manager.using(shard)
+        if not manager.filter(pk=instance.pk).update(**values):
+            manager.bulk_create([model(pk=instance.pk, **values)])
+
+
+def delete_reference(model, pk):
+    """Удаляет копии из шардов вместе с постами и комментариями."""
+    for shard in settings.POST_SHARDS:
+        model._base_manager.using(shard).filter(pk=pk).delete()
+
+
+def _comment_shard(comment):
+    if comment._state.db in settings.POST_SHARDS:
+        return comment._state.db
+    if Comment.post.is_cached(comment):
+        return shard_for(comment.post.author_id)
+    post = first(Post.objects.filter(pk=comment.post_id).only('author_id'))
+    return shard_for(post.author_id) if post is not None else None
+
+
+class ShardRouter:
+    """Запросы к постам и комментариям с известным автором идут в его
+    шард; остальные решает следующий роутер."""
+
+    def _shard(self, model, hints):
+        if not enabled() or model not in SHARDED:
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, Post):
+            return shard_for(instance.author_id)
+        if isinstance(instance, Comment):
+            return _comment_shard(instance)
+        if isinstance(instance, User) and model is Post:
+            # author.posts: все посты автора в его шарде.
+            return shard_for(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if enabled() and (isinstance(obj1, SHARDED)
+                          or isinstance(obj2, SHARDED)):
+            return True
+        return None
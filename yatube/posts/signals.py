@@ -0,0 +1,185 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (caching, counters, images, object_cache, sharding, stats,
+               timeline)
+from .models import Comment, Follow, Group, Post, ProfileStats
+
+User = get_user_model()
+
+
+def post_scopes(post):
+    return (
+        caching.ALL,
+        caching.author_scope(post.author_id),
+        caching.group_scope(post.group_id),
+        caching.post_scope(post.pk),
+    )
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        ProfileStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, using, **kwargs):
+    if created:
+        stats.shift_user(instance.author_id, 'follower_count', 1)
+        stats.shift_user(instance.user_id, 'following_count', 1)
+        timeline.classify(instance.author_id)
+        caching.bump(caching.author_scope(instance.author_id),
+                     caching.author_scope(instance.user_id), using=using)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, using, **kwargs):
+    stats.shift_user(instance.author_id, 'follower_count', -1)
+    stats.shift_user(instance.user_id, 'following_count', -1)
+    timeline.classify(instance.author_id)
+    caching.bump(caching.author_scope(instance.author_id),
+                 caching.author_scope(instance.user_id), using=using)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_saved(sender, instance, raw, using, **kwargs):
+    if instance.pk is None or raw:
+        return
+    saved = Post.objects.using(using).filter(
+        pk=instance.pk).values_list('group_id', 'image').first()
+    if saved is not None:
+        instance._saved_group_id, instance._saved_image = saved
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_sharded_id(sender, instance, raw, **kwargs):
+    # Ключ выдаётся до выбора шарда, чтобы не совпасть с ключами
+    # в других шардах (см. posts.sharding).
+    if instance.pk is None and not raw and sharding.enabled():
+        instance.pk = sharding.next_id()
+
+
+def refresh_image(post, using):
+    images.refresh(post, using)
+    # Страницы, построенные до миниатюры, выводили пост без неё.
+    object_cache.forget(Post, post.pk)
+    caching.bump(*post_scopes(post), using=using)
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    image = instance.image.name or ''
+    saved = '' if created else getattr(instance, '_saved_image', image)
+    if image != saved or (image and not (instance.thumbnail_srcset
+                                         and instance.placeholder_color)):
+        # Картинка обрабатывается после фиксации: транзакция записи не
+        # держит блокировку базы, пока строятся варианты. При
+        # шардировании шард фиксируется раньше default, куда пишет
+        # хранилище ключей sorl-thumbnail, поэтому ждём и default.
+        transaction.on_commit(
+            lambda: transaction.on_commit(
+                lambda: refresh_image(instance, using)),
+            using=using)
+    instance._saved_image = image
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    caching.bump(*post_scopes(instance), using=using)
+    if created:
+        counters.add(counters.post_keys(instance), 1)
+        return
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            counters.add([counters.group_key(old_group_id)], -1)
+        if instance.group_id is not None:
+            counters.add([counters.group_key(instance.group_id)], 1)
+        caching.bump(caching.group_scope(old_group_id), using=using)
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, using, **kwargs):
+    counters.add(counters.post_keys(instance), -1)
+    caching.bump(*post_scopes(instance), using=using)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw, using, **kwargs):
+    if created and not raw:
+        stats.shift_post(instance.post_id, 1, using)
+        object_cache.forget(Post, instance.post_id)
+        caching.bump(*post_scopes(instance.post), using=using)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, using, **kwargs):
+    stats.shift_post(instance.post_id, -1, using)
+    object_cache.forget(Post, instance.post_id)
+    try:
+        caching.bump(*post_scopes(instance.post), using=using)
+    except Post.DoesNotExist:
+        pass
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, using, **kwargs):
+    # Название и адрес группы выводятся в карточках постов на всех лентах.
+    caching.bump(caching.SITE, using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, using, created=False, update_fields=None,
+                 **kwargs):
+    # Имя автора выводится в карточках постов на всех лентах. У нового
+    # пользователя постов ещё нет, а вход меняет только last_login.
+    if created or (update_fields is not None and not set(
+            update_fields) & set(object_cache.CACHED_FIELDS[User])):
+        return
+    caching.bump(caching.SITE, using=using)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+def reference_saved(sender, instance, using, **kwargs):
+    if sharding.enabled() and using == DEFAULT_DB_ALIAS:
+        sharding.copy_reference(instance)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def reference_deleted(sender, instance, using, **kwargs):
+    if sharding.enabled() and using == DEFAULT_DB_ALIAS:
+        sharding.delete_reference(sender, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def object_changed(sender, instance, **kwargs):
+    object_cache.forget_instance(instance)
+
+
+@receiver(post_migrate, sender=apps.get_app_config('posts'))
+def tables_rewritten(sender, **kwargs):
+    # migrate и flush меняют строки в обход сигналов моделей, а всё, что
+    # лежит в кэше, построено из этих строк.
+    cache.clear()
+    caching.tiers.clear()
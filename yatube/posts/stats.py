@@ -0,0 +1,81 @@
+"""Денормализованные счётчики для шаблонов.
+
+``Post.comment_count`` и ``ProfileStats`` позволяют показывать число
+комментариев и подписчиков в карточках без отдельного COUNT(*) на каждую
+карточку. Счётчики сдвигаются F()-выражениями из сигналов, которые
+срабатывают внутри транзакций записывающих представлений, поэтому
+счётчик откатывается вместе со строкой. При шардировании комментарий и
+``Post.comment_count`` лежат в шарде, а ``ProfileStats`` — в ``default``;
+транзакции обеих баз фиксируются по очереди (``sharding.atomic``).
+Расхождения после записей в обход сигналов или сбоя между фиксациями
+исправляет ``recount_stats``.
+
+Число постов автора и группы здесь не хранится: его ведут ``FeedCounter``
+(``posts.counters``), и ``for_user`` берёт его оттуда.
+"""
+from django.db.models import Count, F
+
+from core.routers import background_writes
+
+from . import counters
+from .models import Comment, Follow, Post, ProfileStats
+
+
+def _shift(queryset, field, delta):
+    if delta < 0:
+        # Разошедшийся счётчик не должен уйти в минус.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def shift_user(user_id, field, delta):
+    # Отсутствующую строку не создаём: пользователь может удаляться
+    # в этой же транзакции. Её посчитает for_user при чтении.
+    _shift(ProfileStats.objects.filter(user_id=user_id), field, delta)
+
+
+def shift_post(post_id, delta, using=None):
+    # При шардировании пост лежит в базе комментария, а не в default.
+    _shift(Post.objects.db_manager(using).filter(pk=post_id),
+           'comment_count', delta)
+
+
+def for_user(user_id):
+    """Счётчики пользователя с числом его постов из posts.counters;
+    отсутствующая строка считается заново."""
+    stats = ProfileStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        with background_writes():
+            stats, _ = ProfileStats.objects.get_or_create(
+                user_id=user_id, defaults=count_users([user_id])[user_id])
+    stats.post_count = counters.author_count(user_id)
+    return stats
+
+
+def count_users(user_ids):
+    """Фактические значения ProfileStats для пользователей:
+    {user_id: {'follower_count': ..., 'following_count': ...}}."""
+    user_ids = list(user_ids)
+    result = {
+        user_id: dict(follower_count=0, following_count=0)
+        for user_id in user_ids
+    }
+    for field, column in (('follower_count', 'author'),
+                          ('following_count', 'user')):
+        rows = (Follow.objects.filter(**{f'{column}_id__in': user_ids})
+                .order_by().values(column).annotate(total=Count('pk'))
+                .values_list(column, 'total'))
+        for user_id, total in rows:
+            result[user_id][field] = total
+    return result
+
+
+def count_comments(post_ids, using):
+    """Число комментариев постов из базы using: комментарии лежат в той
+    же базе, что и их пост."""
+    counts = dict.fromkeys(post_ids, 0)
+    counts.update(
+        Comment.objects.using(using).filter(post_id__in=post_ids)
+        .order_by().values('post').annotate(total=Count('pk'))
+        .values_list('post', 'total'))
+    return counts
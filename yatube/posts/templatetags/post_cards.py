@@ -0,0 +1,27 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.caching import cached_cards
+from posts.images import resolve_thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_include.html'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """HTML карточек постов страницы из кэша фрагментов:
+    {% post_cards page_obj as cards %}."""
+    author = context.get('author')
+    group = context.get('group')
+    variant = ('a' if author else '') + ('g' if group else '')
+    cards = cached_cards(
+        posts,
+        lambda post: render_to_string(
+            CARD_TEMPLATE, {'post': post, 'author': author, 'group': group}),
+        variant,
+        prepare=resolve_thumbnails,
+    )
+    return [mark_safe(card) for card in cards]
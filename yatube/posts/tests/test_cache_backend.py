@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import SQLiteCache
+
+
+def increment(location, times):
+    backend = SQLiteCache(location, {})
+    for _ in range(times):
+        backend.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.backend()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def backend(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """get/set/add/delete/get_many ведут себя как у других бэкендов."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'absent']),
+                         {'a': 1, 'b': 2})
+        self.cache.delete_many(['a', 'key'])
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('a'))
+        self.assertTrue(self.cache.has_key('b'))
+        self.assertEqual(self.cache.get('absent', 'default'), 'default')
+
+    def test_expired_entries_are_misses(self):
+        """Просроченная запись не читается, а add() её заменяет."""
+        self.cache.set('key', 'value', -1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'fresh'))
+        self.assertEqual(self.cache.get('key'), 'fresh')
+        self.assertTrue(self.cache.touch('key', -1))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_entries_are_shared_between_instances(self):
+        """Запись одного экземпляра видна другому, как процессу-соседу."""
+        self.cache.set('key', 'value')
+        other = self.backend()
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_is_atomic_across_processes(self):
+        """Инкременты из нескольких процессов не теряются."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.decr('counter', 10), 190)
+        with self.assertRaises(ValueError):
+            self.cache.incr('absent')
+
+    @mock.patch('core.cache.ACCESS_RESOLUTION', 0)
+    def test_least_recently_read_entries_are_evicted(self):
+        """При превышении MAX_ENTRIES вытесняются давно не читанные
+        записи."""
+        backend = self.backend(MAX_ENTRIES=10, CULL_FREQUENCY=5)
+        for num in range(10):
+            backend.set(f'key{num}', num)
+        backend.get_many(['key0', 'key1'])
+        backend.set('key10', 10)
+        self.assertLessEqual(backend.stats()[0], 10)
+        self.assertEqual(backend.get_many(['key0', 'key1', 'key10']),
+                         {'key0': 0, 'key1': 1, 'key10': 10})
+        self.assertIsNone(backend.get('key2'))
+
+    def test_size_cap(self):
+        """Суммарный размер записей не превышает MAX_BYTES, слишком
+        большая запись не сохраняется."""
+        backend = self.backend(MAX_BYTES=10_000)
+        for num in range(20):
+            backend.set(f'key{num}', 'x' * 1000)
+        entries, size = backend.stats()
+        self.assertLessEqual(size, 10_000)
+        self.assertLess(entries, 20)
+        backend.set('huge', 'x' * 20_000)
+        self.assertIsNone(backend.get('huge'))
+        backend.clear()
+        self.assertEqual(backend.stats(), (0, 0))
+
+    def test_usable_as_default_cache(self):
+        """Бэкенд подключается через CACHES['default']."""
+        settings = {'default': {'BACKEND': 'core.cache.SQLiteCache',
+                                'LOCATION': self.location}}
+        with override_settings(CACHES=settings):
+            self.assertIsInstance(caches['default'], SQLiteCache)
+            cache.set('key', 'value')
+            self.assertEqual(self.cache.get('key'), 'value')
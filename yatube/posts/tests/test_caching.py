@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from .. import caching, cards, views
+from ..caching import tiers
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class TwoTierCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.user_reader = User.objects.create_user(username='TestReader')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test-slug')
+        cls.post = Post.objects.create(author=cls.user_author,
+                                       group=cls.group,
+                                       text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+        tiers.hits.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.user_reader)
+
+    def test_second_read_comes_from_process_memory(self):
+        """Повторное чтение не обращается к общему кэшу, а после
+        очистки L1 запись берётся из общего кэша."""
+        tiers.set('key', 'value', None)
+        cache.delete('key')
+        self.assertEqual(tiers.get('key'), 'value')
+        tiers.clear()
+        tiers.set_many({'key': 'value'}, None)
+        tiers.clear()
+        self.assertEqual(tiers.get('key'), 'value')
+        self.assertIsNone(tiers.get('absent'))
+        self.assertEqual(tiers.hits, Counter(l1=1, l2=1, miss=1))
+        self.assertEqual(tiers.hit_rates(), {'l1': 1 / 3, 'l2': 1 / 3})
+
+    @override_settings(L1_CACHE_ENTRIES=2)
+    def test_process_memory_is_bounded(self):
+        """L1 вытесняет давно не читанные записи."""
+        tiers.set_many({'a': 1, 'b': 2}, None)
+        tiers.get('a')
+        tiers.set('c', 3, None)
+        tiers.hits.clear()
+        self.assertEqual(tiers.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(tiers.hits, Counter(l1=2, l2=1))
+
+    def test_writes_make_local_pages_stale(self):
+        """Правка поста, комментарий и подписка меняют версии, и копии
+        страниц в памяти процесса перестают отдаваться."""
+        post_url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+        profile_url = reverse('posts:profile',
+                              kwargs={'username': 'TestAuthor'})
+        urls_writes = (
+            (reverse('posts:index'),
+             lambda: self.author_client.post(
+                 reverse('posts:post_edit',
+                         kwargs={'post_id': self.post.pk}),
+                 data={'text': 'Отредактированный пост'})),
+            (post_url,
+             lambda: self.reader_client.post(
+                 reverse('posts:add_comment',
+                         kwargs={'post_id': self.post.pk}),
+                 data={'text': 'Комментарий'})),
+            (profile_url,
+             lambda: self.reader_client.get(
+                 reverse('posts:profile_follow',
+                         kwargs={'username': 'TestAuthor'}))),
+        )
+        for url, write in urls_writes:
+            with self.subTest(url=url):
+                before = self.guest_client.get(url).content
+                tiers.hits.clear()
+                self.assertEqual(self.guest_client.get(url).content, before)
+                self.assertEqual(tiers.hits['l1'], 1)
+                write()
+                self.assertNotEqual(self.guest_client.get(url).content,
+                                    before)
+        self.assertTrue(Follow.objects.filter(
+            user=self.user_reader, author=self.user_author).exists())
+
+    def test_stale_local_copy_falls_back_to_shared_cache(self):
+        """Устаревшая копия в L1 не мешает взять свежую запись, которую
+        положил в общий кэш другой процесс."""
+        tiers.set('page', ('old', 'text/html', {'all': 1}), None)
+        cache.set('gen:all', 2, None)
+        page_generations = {'all': 2}
+        page_generations.update(caching.generations([caching.SITE]))
+        cache.set('page', ('new', 'text/html', page_generations), None)
+        self.assertEqual(tiers.get('page', valid=caching._fresh)[0], 'new')
+        self.assertEqual(tiers.hits, Counter(l2=1))
+
+
+def always(value):
+    return True
+
+
+def run_concurrently(func, threads=8):
+    """Вызывает func() из нескольких потоков одновременно."""
+    barrier = threading.Barrier(threads)
+    results = []
+
+    def target():
+        barrier.wait()
+        try:
+            results.append(func())
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+class FetchTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+        caching.stampede.clear()
+        self.builds = []
+
+    def build(self, value='new'):
+        def build():
+            self.builds.append(value)
+            time.sleep(0.1)
+            return value
+        return build
+
+    def test_concurrent_misses_build_once(self):
+        """Одновременные промахи потоков процесса ждут одного
+        построения."""
+        results = run_concurrently(
+            lambda: caching.fetch('key', always, self.build(),
+                                  None))
+        self.assertEqual(results, ['new'] * 8)
+        self.assertEqual(self.builds, ['new'])
+
+    def test_stale_value_served_while_one_request_rebuilds(self):
+        """Устаревшее значение перестраивает один запрос, остальные
+        отдают прежнее."""
+        caching.fetch('key', always, lambda: 'old', None)
+        results = run_concurrently(
+            lambda: caching.fetch('key', lambda value: value == 'new',
+                                  self.build(), None))
+        self.assertEqual(self.builds, ['new'])
+        self.assertIn('new', results)
+        self.assertIn('old', results)
+        self.assertEqual(caching.stampede['stale'], results.count('old'))
+        self.assertEqual(
+            caching.fetch('key', lambda value: value == 'new',
+                          self.build('again'), None),
+            'new')
+
+    def test_early_recompute_near_expiry(self):
+        """Запись со сроком перестраивается заранее, если до конца
+        срока осталось меньше нескольких длительностей перестроения."""
+        tiers.set('far', ('old', 0.001, time.time() + 60), None)
+        tiers.set('near', ('old', 10.0, time.time() + 1), None)
+        tiers.set('expired', ('old', 0.001, time.time() - 1), None)
+        with mock.patch('posts.caching.random.random', return_value=0.5):
+            self.assertEqual(caching.fetch('far', always, self.build(), 60),
+                             'old')
+            self.assertEqual(caching.fetch('near', always, self.build(), 60),
+                             'new')
+            self.assertEqual(
+                caching.fetch('expired', always, self.build(), 60), 'new')
+        self.assertEqual(len(self.builds), 2)
+
+    def test_uncacheable_result_is_not_stored(self):
+        """None от build() не кладётся в кэш."""
+        caching.fetch('key', always, lambda: None, None)
+        self.assertIsNone(cache.get('key'))
+
+
+class PageStampedeTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+        self.user_author = User.objects.create_user(username='TestAuthor')
+        Post.objects.create(author=self.user_author, text='Тестовый пост')
+
+    def test_one_index_rebuild_per_change(self):
+        """После записи и после очистки кэша главную страницу
+        перестраивает один запрос из одновременных."""
+        builds = []
+
+        def slow_feed_cards(*args, **kwargs):
+            builds.append(1)
+            time.sleep(0.1)
+            return feed_cards(*args, **kwargs)
+
+        url = reverse('posts:index')
+        feed_cards = views.feed_cards
+        with mock.patch('posts.views.feed_cards', slow_feed_cards):
+            Client().get(url)
+            Post.objects.create(author=self.user_author, text='Новый пост')
+            responses = run_concurrently(lambda: Client().get(url))
+            self.assertEqual(len(builds), 2)
+            cache.clear()
+            tiers.clear()
+            run_concurrently(lambda: Client().get(url))
+            self.assertEqual(len(builds), 3)
+        self.assertEqual({response.status_code for response in responses},
+                         {200})
+        self.assertContains(Client().get(url), 'Новый пост')
+
+    def test_page_rebuild_does_not_serve_stale_cards(self):
+        """Перестроение страницы строит устаревший срез карточек заново,
+        даже если его аренду держит другой запрос: иначе страница со
+        старыми карточками сохранилась бы как свежая."""
+        per_page = settings.POSTS_ON_THE_PAGE_NUM
+        for num in range(per_page):
+            Post.objects.create(author=self.user_author, text=f'Пост {num}')
+        url = reverse('posts:index')
+        Client().get(url)
+        Post.objects.create(author=self.user_author, text='Новый пост')
+        cache.add(f'lease:cards:{cards.CARD_FORMAT}:{caching.ALL}:0:'
+                  f'{per_page}', True, None)
+        self.assertContains(Client().get(url), 'Новый пост')
+        self.assertContains(Client().get(url), 'Новый пост')
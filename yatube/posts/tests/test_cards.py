@@ -0,0 +1,163 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import images
+from ..cards import CARD_FORMAT, FeedCard, FeedQuery, pack, unpack
+from ..models import Follow, Group, Post
+from ..timeline import follow_feed
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class FeedCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(
+            username='TestAuthor', first_name='Лев', last_name='Толстой')
+        cls.user_follower = User.objects.create_user(
+            username='TestUserFollower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Длинное описание группы',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user_author,
+            group=cls.group,
+            text='Тестовый пост',
+            image=SimpleUploadedFile(
+                name='img-test.gif',
+                content=(b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00'
+                         b'\x00\x00\x21\xf9\x04\x01\x00\x00\x00\x00\x2c'
+                         b'\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x01'
+                         b'\x00\x00\x3b'),
+                content_type='image/gif',
+            ),
+        )
+        # Миниатюра строится после фиксации, которой в TestCase нет.
+        images.refresh(cls.post)
+        Follow.objects.create(user=cls.user_follower, author=cls.user_author)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.user_author.username}),
+            reverse('posts:follow_index'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user_follower)
+
+    def test_feeds_select_only_card_columns(self):
+        """Запросы лент не читают пароль, почту автора и описание
+        группы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                feed_sql = [query['sql'] for query in queries
+                            if 'FROM "posts_post"' in query['sql']]
+                self.assertTrue(feed_sql)
+                for sql in feed_sql:
+                    self.assertNotIn('"password"', sql)
+                    self.assertNotIn('"email"', sql)
+                    self.assertNotIn('"description"', sql)
+
+    def test_feeds_render_cards(self):
+        """Ленты получают FeedCard без __dict__ и выводят их полностью."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                card = response.context['page_obj'][0]
+                self.assertIsInstance(card, FeedCard)
+                self.assertFalse(hasattr(card, '__dict__'))
+                self.assertEqual(card, self.post)
+                self.assertContains(response, 'card-img')
+                self.assertContains(response, self.post.text)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Лев Толстой')
+        self.assertContains(
+            response, reverse('posts:group_list', args=[self.group.slug]))
+
+
+class CardFormatTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(
+            username='TestAuthor', first_name='Лев')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test-slug')
+        Post.objects.create(author=cls.user_author, group=cls.group,
+                            text='С группой')
+        Post.objects.create(author=cls.user_author, text='Без группы')
+
+    def setUp(self):
+        cache.clear()
+
+    def fields(self, card):
+        return (card.pk, card.text, card.pub_date, card.image,
+                card.thumbnail_url, card.thumbnail_width,
+                card.thumbnail_height, card.thumbnail_srcset,
+                card.thumbnail_webp_srcset, card.placeholder_color,
+                card.placeholder, card.comment_count,
+                card.author.username, card.author.get_full_name(),
+                card.group.slug if card.group else None,
+                card.feed_date, card.feed_id)
+
+    def test_pack_round_trip(self):
+        """unpack(pack(cards)) восстанавливает все поля карточек."""
+        cards = list(FeedQuery(Post.objects.all()))
+        Follow.objects.create(
+            user=User.objects.create_user(username='TestUserFollower'),
+            author=self.user_author)
+        feed_cards = list(FeedQuery(follow_feed(
+            User.objects.get(username='TestUserFollower'))))
+        self.assertIsNotNone(feed_cards[0].feed_id)
+        for original in (cards, feed_cards, []):
+            with self.subTest(cards=original):
+                self.assertEqual(
+                    [self.fields(card) for card in unpack(pack(original))],
+                    [self.fields(card) for card in original])
+
+    def test_other_format_is_a_miss(self):
+        """Запись другой версии формата не разбирается."""
+        data = (CARD_FORMAT + 1,) + pack(FeedQuery(Post.objects.all()))[1:]
+        self.assertIsNone(unpack(data))
+        self.assertIsNone(unpack(None))
+
+    def test_feed_pages_are_cached_until_write(self):
+        """Страница ленты берётся из кэша без запросов к постам, а новый
+        пост делает её устаревшей."""
+        client = Client()
+        client.force_login(self.user_author)
+        url = reverse('posts:index')
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertFalse([query for query in queries
+                          if 'FROM "posts_post"' in query['sql']])
+        self.assertEqual(len(response.context['page_obj']), 2)
+        Post.objects.create(author=self.user_author, text='Новый пост')
+        response = client.get(url)
+        self.assertEqual(response.context['page_obj'][0].text, 'Новый пост')
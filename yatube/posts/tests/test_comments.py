@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_ON_THE_PAGE_NUM=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.post = Post.objects.create(author=cls.user_author,
+                                       text='Тестовый пост')
+        cls.TEST_COMMENTS_NUM: int = 12
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user_author,
+                    text=f'Комментарий {num:02}')
+            for num in range(cls.TEST_COMMENTS_NUM)
+        ])
+        cls.detail_url = reverse('posts:post_detail',
+                                 kwargs={'post_id': cls.post.pk})
+        cls.fragment_url = reverse('posts:post_comments',
+                                   kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_post_detail_renders_first_batch(self):
+        """Страница поста выводит только первую пачку комментариев
+        и ссылку на следующую."""
+        response = self.guest_client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(self.texts(comments),
+                         [f'Комментарий {num:02}' for num in range(5)])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-fragment')
+        self.assertNotContains(response, 'Комментарий 05')
+
+    def test_load_more_returns_remaining_comments(self):
+        """Фрагменты «Показать ещё» выдают остальные комментарии
+        без пропусков и повторов."""
+        comments = self.guest_client.get(
+            self.detail_url).context['comments']
+        texts = self.texts(comments)
+        while comments.has_next():
+            response = self.guest_client.get(
+                self.fragment_url, {'cursor': comments.next_cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, '<html')
+            comments = response.context['comments']
+            texts += self.texts(comments)
+        self.assertEqual(
+            texts,
+            [f'Комментарий {num:02}'
+             for num in range(self.TEST_COMMENTS_NUM)])
+
+    @override_settings(COMMENTS_NEWEST_FIRST=True)
+    def test_newest_first(self):
+        """С COMMENTS_NEWEST_FIRST первыми выводятся новые комментарии."""
+        comments = self.guest_client.get(
+            self.detail_url).context['comments']
+        self.assertEqual(self.texts(comments)[0], 'Комментарий 11')
+
+    def test_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cost_does_not_grow_with_comments(self):
+        """Число запросов и размер страницы поста не зависят от числа
+        комментариев сверх первой пачки."""
+        # Первый показ заполняет счётчик постов автора.
+        self.guest_client.get(self.detail_url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(self.detail_url)
+        size = len(response.content)
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user_author,
+                    text=f'Ещё комментарий {num}')
+            for num in range(200)
+        ])
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            response = self.guest_client.get(self.detail_url)
+        self.assertEqual(len(response.content), size)
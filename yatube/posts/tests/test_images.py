@@ -0,0 +1,251 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from .. import counters, images
+from ..caching import tiers
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+       b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+       b'\x02\x00\x01\x00\x00\x02\x02\x0C\x0A\x00\x3B')
+
+
+def uploaded(name):
+    return SimpleUploadedFile(name=name, content=GIF,
+                              content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TransactionTestCase):
+    """Миниатюры строятся после фиксации транзакции, поэтому тесты идут
+    без общей транзакции TestCase."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+        self.user_author = User.objects.create_user(username='TestAuthor')
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+
+    def test_thumbnail_built_on_upload(self):
+        """Миниатюра строится при создании поста, адрес и размеры
+        записываются в пост."""
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'С картинкой',
+                                      'image': uploaded('first.gif')})
+        post = Post.objects.get()
+        self.assertEqual((post.thumbnail_width, post.thumbnail_height),
+                         (960, 339))
+        name = post.thumbnail_url[len(settings.MEDIA_URL):]
+        self.assertTrue(default_storage.exists(name))
+
+    def test_thumbnail_built_after_commit(self):
+        """Миниатюра строится после фиксации записи, а страница,
+        построенная до неё, устаревает."""
+        url = reverse('posts:index')
+        Client().get(url)
+        refresh = images.refresh
+
+        def refresh_later(post, using):
+            self.assertFalse(connection.in_atomic_block)
+            self.assertNotContains(Client().get(url), 'srcset=')
+            refresh(post, using)
+
+        with mock.patch.object(images, 'refresh',
+                               side_effect=refresh_later) as refreshed:
+            with transaction.atomic():
+                post = Post.objects.create(author=self.user_author,
+                                           text='Пост',
+                                           image=uploaded('late.gif'))
+                refreshed.assert_not_called()
+            refreshed.assert_called_once()
+        self.assertContains(Client().get(url),
+                            f'srcset="{post.thumbnail_srcset}"')
+
+    def test_variants_built_on_upload(self):
+        """При загрузке строятся все ширины в формате картинки и в WebP,
+        лента выводит их через srcset."""
+        post = Post.objects.create(author=self.user_author, text='Пост',
+                                   image=uploaded('variants.gif'))
+        for field, extension in (('thumbnail_srcset', '.gif'),
+                                 ('thumbnail_webp_srcset', '.webp')):
+            with self.subTest(field=field):
+                candidates = [
+                    candidate.split()
+                    for candidate in getattr(post, field).split(', ')]
+                self.assertEqual(
+                    [width for _, width in candidates],
+                    [f'{width}w' for width in images.CARD_WIDTHS])
+                for url, _ in candidates:
+                    self.assertTrue(url.endswith(extension))
+                    self.assertTrue(default_storage.exists(
+                        url[len(settings.MEDIA_URL):]))
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'<source type="image/webp" srcset="{post.thumbnail_webp_srcset}"')
+        self.assertContains(response, f'srcset="{post.thumbnail_srcset}"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_placeholder_computed_on_upload(self):
+        """При загрузке в пост записываются основной цвет и размытое
+        превью, лента вписывает их в страницу."""
+        content = BytesIO()
+        Image.new('RGB', (300, 120), (200, 30, 30)).save(content, 'PNG')
+        post = Post.objects.create(
+            author=self.user_author, text='Пост',
+            image=SimpleUploadedFile('red.png', content.getvalue(),
+                                     content_type='image/png'))
+        self.assertEqual(post.placeholder_color, '#c81e1e')
+        prefix = 'data:image/webp;base64,'
+        self.assertTrue(post.placeholder.startswith(prefix))
+        preview = base64.b64decode(post.placeholder[len(prefix):])
+        self.assertLess(len(preview), 300)
+        self.assertEqual(Image.open(BytesIO(preview)).size,
+                         images.PLACEHOLDER_SIZE)
+        self.assertContains(
+            Client().get(reverse('posts:index')),
+            f'style="background: #c81e1e url({post.placeholder})')
+
+    def test_feeds_render_without_thumbnail_lookups(self):
+        """Ленты и страница поста выводят миниатюру из полей поста, не
+        обращаясь к sorl-thumbnail."""
+        post = Post.objects.create(author=self.user_author, text='Пост',
+                                   image=uploaded('feed.gif'))
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        with mock.patch('sorl.thumbnail.base.ThumbnailBackend'
+                        '.get_thumbnail') as get_thumbnail:
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assertContains(
+                        Client().get(url),
+                        f'src="{post.thumbnail_url}">')
+        get_thumbnail.assert_not_called()
+
+    def test_thumbnail_rebuilt_only_for_new_image(self):
+        """Правка текста не строит миниатюру заново, новая картинка
+        строит."""
+        post = Post.objects.create(author=self.user_author, text='Пост',
+                                   image=uploaded('old.gif'))
+        old_url = post.thumbnail_url
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        with mock.patch.object(images, 'get_thumbnail',
+                               wraps=images.get_thumbnail) as get_thumbnail:
+            self.author_client.post(url, data={'text': 'Новый текст'})
+            get_thumbnail.assert_not_called()
+            self.author_client.post(url, data={'text': 'Новый текст',
+                                               'image': uploaded('new.gif')})
+            self.assertEqual(get_thumbnail.call_count,
+                             2 * len(images.CARD_WIDTHS))
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail_url, old_url)
+        self.assertEqual(post.thumbnail_width, 960)
+
+    def test_unreadable_image(self):
+        """Пост с нечитаемой картинкой сохраняется без миниатюры."""
+        with self.assertLogs('sorl.thumbnail', 'ERROR'):
+            post = Post.objects.create(author=self.user_author, text='Пост',
+                                       image='posts/missing.jpg')
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_url, '')
+        self.assertIsNone(post.thumbnail_width)
+        self.assertEqual(post.placeholder, '')
+
+    def test_command_fills_missing_thumbnails(self):
+        """generate_thumbnails строит миниатюры постов, сохранённых без
+        сигналов."""
+        image = default_storage.save('posts/bulk.gif', uploaded('bulk.gif'))
+        Post.objects.bulk_create([
+            Post(author=self.user_author, text='Без миниатюры', image=image),
+            Post(author=self.user_author, text='Без картинки'),
+        ])
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'thumbnail_width', flat=True)),
+            [960, None])
+
+    def legacy_posts(self, count):
+        """Посты с построенными миниатюрами, которые не записаны в пост:
+        так выглядят посты до generate_thumbnails."""
+        posts = []
+        for num in range(count):
+            image = default_storage.save(f'posts/legacy{num}.gif',
+                                         uploaded(f'legacy{num}.gif'))
+            get_thumbnail(image, images.CARD_GEOMETRY, **images.CARD_OPTIONS)
+            posts.append(Post(author=self.user_author, text=f'Пост {num}',
+                              image=image))
+        Post.objects.bulk_create(posts)
+        # bulk_create обходит сигналы счётчиков лент.
+        call_command('recount_feeds', stdout=StringIO())
+        counters.total_count()
+        # Миниатюры строились в другом процессе: в кэше их записей нет.
+        cache.clear()
+        tiers.clear()
+
+    def render_index(self):
+        """Главная страница, число обращений к кэшу sorl-thumbnail,
+        запросов к его таблице и всех запросов при её рендере."""
+        calls = []
+        cache_get_many = default.kvstore.cache.get_many
+
+        def counted(keys, *args, **kwargs):
+            calls.append(keys)
+            return cache_get_many(keys, *args, **kwargs)
+
+        with CaptureQueriesContext(connection) as queries, \
+                mock.patch.object(default.kvstore, '_get_raw') as get_raw, \
+                mock.patch.object(default.kvstore.cache, 'get_many',
+                                  counted):
+            response = Client().get(reverse('posts:index'))
+        get_raw.assert_not_called()
+        sorl_calls = [keys for keys in calls
+                      if any(key.startswith('sorl-thumbnail')
+                             for key in keys)]
+        kvstore_queries = [query for query in queries.captured_queries
+                           if 'thumbnail_kvstore' in query['sql']]
+        return response, len(sorl_calls), len(kvstore_queries), len(queries)
+
+    def test_feed_page_resolves_legacy_thumbnails_in_one_batch(self):
+        """Миниатюры постов без записанных полей страница ленты находит
+        одним get_many и одним запросом, сколько бы постов на ней ни
+        было."""
+        self.legacy_posts(2)
+        _, *small = self.render_index()
+        Post.objects.all().delete()
+        self.legacy_posts(settings.POSTS_ON_THE_PAGE_NUM)
+        response, *full = self.render_index()
+        self.assertEqual(full[:2], [1, 1])
+        self.assertEqual(small, full)
+        for post in Post.objects.all():
+            url = images.card_thumbnail(post.image)[0]
+            self.assertContains(response, f'src="{url}">')
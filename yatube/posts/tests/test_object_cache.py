@@ -0,0 +1,193 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import object_cache
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ObjectCacheTests(TransactionTestCase):
+    """Кэш наполняется только вне транзакций, поэтому тесты идут
+    без обёртки TestCase."""
+
+    def setUp(self):
+        cache.clear()
+        object_cache.hits.clear()
+        object_cache.misses.clear()
+        self.user_author = User.objects.create_user(username='TestAuthor')
+        self.group = Group.objects.create(title='Тестовая группа',
+                                          slug='test-slug')
+        self.post = Post.objects.create(author=self.user_author,
+                                        group=self.group,
+                                        text='Тестовый пост')
+
+    def test_lookups_hit_cache_after_first_read(self):
+        """Повторные выборки по pk и натуральному ключу не ходят в базу
+        и учитываются в счётчиках попаданий."""
+        lookups = (
+            lambda: object_cache.get_post(self.post.pk),
+            lambda: object_cache.get_by_natural_key(Group, 'test-slug'),
+            lambda: object_cache.get_by_natural_key(User, 'TestAuthor'),
+        )
+        for lookup in lookups:
+            lookup()
+        object_cache.hits.clear()
+        object_cache.misses.clear()
+        for lookup in lookups:
+            with self.assertNumQueries(0):
+                lookup()
+        post = object_cache.get_post(self.post.pk)
+        self.assertEqual(post.author, self.user_author)
+        self.assertEqual(post.group.title, 'Тестовая группа')
+        self.assertEqual(object_cache.hit_ratio(), 1)
+
+    def test_users_cached_without_private_fields(self):
+        """В кэш попадают только выводимые поля пользователя, без хэша
+        пароля и почты."""
+        self.user_author.email = 'author@example.com'
+        self.user_author.set_password('secret-password')
+        self.user_author.save()
+        object_cache.get_by_natural_key(User, 'TestAuthor')
+        cached = cache.get(object_cache._pk_key(User, self.user_author.pk))
+        self.assertEqual(cached.username, 'TestAuthor')
+        self.assertEqual(cached.get_deferred_fields(),
+                         {'password', 'email', 'last_login', 'is_superuser',
+                          'is_staff', 'is_active', 'date_joined'})
+
+    def test_save_and_delete_invalidate(self):
+        """Правка и удаление объекта сразу видны в выборках, а старый
+        slug после переименования не находит группу."""
+        object_cache.get_by_natural_key(Group, 'test-slug')
+        self.group.title = 'Новое название'
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertIsNone(
+            object_cache.get_by_natural_key(Group, 'test-slug'))
+        self.assertEqual(
+            object_cache.get_by_natural_key(Group, 'new-slug').title,
+            'Новое название')
+        object_cache.get_post(self.post.pk)
+        self.post.delete()
+        self.assertIsNone(object_cache.get_post(self.post.pk))
+
+    def test_comment_refreshes_post_counter(self):
+        """Новый комментарий обновляет счётчик закэшированного поста."""
+        object_cache.get_post(self.post.pk)
+        Comment.objects.create(post=self.post, author=self.user_author,
+                               text='Комментарий')
+        self.assertEqual(object_cache.get_post(self.post.pk).comment_count, 1)
+
+    def test_rolled_back_reads_are_not_cached(self):
+        """Объект, прочитанный в откаченной транзакции, не остаётся
+        в кэше."""
+        try:
+            with transaction.atomic():
+                User.objects.create_user(username='Ghost')
+                object_cache.get_by_natural_key(User, 'Ghost')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertIsNone(object_cache.get_by_natural_key(User, 'Ghost'))
+
+    def test_views_use_cache(self):
+        """Страницы группы, профиля и поста повторно не выбирают свои
+        объекты из базы."""
+        client = Client()
+        client.force_login(self.user_author)
+        urls = {
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}):
+                'FROM "posts_group" WHERE',
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}):
+                '"auth_user"."username" =',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                'FROM "posts_post" WHERE "posts_post"."id" =',
+        }
+        for url, lookup_sql in urls.items():
+            with self.subTest(url=url):
+                client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(client.get(url).status_code, 200)
+                self.assertFalse([query for query in queries
+                                  if lookup_sql in query['sql']])
+
+
+class NegativeCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        object_cache.negative_hits.clear()
+        self.user_author = User.objects.create_user(username='TestAuthor')
+
+    def test_misses_are_cached_until_created(self):
+        """Повторный промах не ходит в базу, а созданный объект сразу
+        находится."""
+        lookups = (
+            (lambda: object_cache.get_post(10_000),
+             lambda: Post.objects.create(id=10_000, author=self.user_author,
+                                         text='Тестовый пост')),
+            (lambda: object_cache.get_by_natural_key(Group, 'no-slug'),
+             lambda: Group.objects.create(title='Группа', slug='no-slug')),
+            (lambda: object_cache.get_by_natural_key(User, 'Nobody'),
+             lambda: User.objects.create_user(username='Nobody')),
+        )
+        for lookup, create in lookups:
+            with self.subTest(create=create):
+                self.assertIsNone(lookup())
+                with self.assertNumQueries(0):
+                    self.assertIsNone(lookup())
+                create()
+                self.assertIsNotNone(lookup())
+        self.assertEqual(sum(object_cache.negative_hits.values()), 3)
+
+    def test_rename_clears_miss(self):
+        """Переименование в искомый slug снимает метку промаха."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        self.assertIsNone(
+            object_cache.get_by_natural_key(Group, 'new-slug'))
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(
+            object_cache.get_by_natural_key(Group, 'new-slug'), group)
+
+    def test_scan_costs_no_queries(self):
+        """Повторный запрос несуществующей страницы отдаёт готовую 404
+        без запросов к базе."""
+        client = Client()
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'no-slug'}),
+            reverse('posts:profile', kwargs={'username': 'Nobody'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10_000}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                client.get(url)
+                with self.assertNumQueries(0):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertContains(response, url, status_code=404)
+
+    def test_not_found_path_is_escaped(self):
+        """Адрес подставляется в готовую 404 экранированным."""
+        response = Client().get('/profile/<b>x</b>/')
+        self.assertContains(response, '&lt;b&gt;x&lt;/b&gt;',
+                            status_code=404)
+        self.assertNotContains(response, '<b>x</b>', status_code=404)
+
+
+class PostEditTests(TestCase):
+    def test_edit_keeps_comment_counter(self):
+        """Правка поста не затирает счётчик комментариев устаревшей
+        копией."""
+        user = User.objects.create_user(username='TestAuthor')
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        Post.objects.filter(pk=post.pk).update(comment_count=5)
+        client = Client()
+        client.force_login(user)
+        client.post(reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                    data={'text': 'Новый текст'})
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comment_count), ('Новый текст', 5))
@@ -0,0 +1,225 @@
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import counters
+from ..models import FeedCounter, Follow, Group, Post
+from ..paginator import NEXT, CountedPaginator, CursorPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        cls.TEST_POSTS_NUM: int = 23
+        cls.PER_PAGE: int = 5
+        # bulk_create даёт записи с почти одинаковой датой, поэтому
+        # порядок внутри одной даты определяет только id.
+        Post.objects.bulk_create([
+            Post(author=cls.user_author, group=cls.group,
+                 text='Тестовый пост' + str(post_num))
+            for post_num in range(cls.TEST_POSTS_NUM)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.paginator = CursorPaginator(Post.objects.all(), self.PER_PAGE)
+
+    def test_forward_pages_cover_feed_in_order(self):
+        """Переход по курсорам вперёд выдаёт всю ленту в порядке
+        Post.Meta.ordering без пропусков и повторов."""
+        seen = []
+        page = self.paginator.get_page()
+        self.assertFalse(page.has_previous())
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = self.paginator.get_page(page.next_cursor)
+        self.assertEqual(
+            seen, list(Post.objects.values_list('pk', flat=True)))
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает ту же страницу, что была до перехода."""
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        back = self.paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        back = self.paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор не ломает страницу, а ведёт на первую."""
+        first = self.paginator.get_page()
+        for cursor in ('garbage', 'bm90LWpzb24', '!!!'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(list(self.paginator.get_page(cursor)),
+                                 list(first))
+
+    def test_empty_page_links_back_from_cursor(self):
+        """Курсор за концом ленты даёт пустую страницу, ссылка назад с
+        которой ведёт на последние записи."""
+        cursor = self.paginator.encode_cursor(
+            NEXT, [datetime(2000, 1, 1), 0])
+        page = self.paginator.get_page(cursor)
+        self.assertEqual(list(page), [])
+        back = self.paginator.get_page(page.previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back],
+            list(Post.objects.values_list('pk', flat=True))[-self.PER_PAGE:])
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_stale_cursor_page_renders(self):
+        """Лента с курсором, за которым не осталось постов, отвечает
+        пустой страницей со ссылкой назад, а не ошибкой."""
+        cursor = self.paginator.encode_cursor(
+            NEXT, [datetime(2000, 1, 1), 0])
+        response = Client().get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response,
+            f'?cursor={response.context["page_obj"].previous_cursor}')
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_views_use_cursor_links(self):
+        """В режиме курсоров ленты отдают ссылки ?cursor= вместо ?page=."""
+        client = Client()
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user_author.username}),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                response = client.get(url)
+                page = response.context['page_obj']
+                self.assertContains(response, f'?cursor={page.next_cursor}')
+                self.assertNotContains(response, '?page=')
+                response = client.get(url, {'cursor': page.next_cursor})
+                self.assertTrue(response.context['page_obj'].has_previous())
+
+
+class FeedCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.user_follower = User.objects.create_user(username='TestFollower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+        )
+        Post.objects.create(author=cls.user_author, group=cls.group,
+                            text='Тестовый пост')
+        Follow.objects.create(user=cls.user_follower, author=cls.user_author)
+
+    def setUp(self):
+        cache.clear()
+
+    def counter(self, key):
+        return FeedCounter.objects.get(key=key).value
+
+    def test_counts_follow_post_writes(self):
+        """Счётчики лент меняются при создании, переносе и удалении поста."""
+        group_key = counters.group_key(self.group.pk)
+        author_key = counters.author_key(self.user_author.pk)
+        self.assertEqual(counters.total_count(), 1)
+        self.assertEqual(counters.group_count(self.group.pk), 1)
+        self.assertEqual(counters.author_count(self.user_author.pk), 1)
+        post = Post.objects.create(author=self.user_author, group=self.group,
+                                   text='Ещё пост')
+        self.assertEqual(self.counter(counters.ALL), 2)
+        self.assertEqual(self.counter(group_key), 2)
+        self.assertEqual(self.counter(author_key), 2)
+        self.assertEqual(counters.follow_count(self.user_follower), 2)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.counter(group_key), 1)
+        post.delete()
+        self.assertEqual(self.counter(counters.ALL), 1)
+        self.assertEqual(self.counter(author_key), 1)
+
+    def test_paginator_uses_counter_instead_of_count_query(self):
+        """Пагинатор ленты не делает COUNT(*), если счётчик уже есть."""
+        counters.total_count()
+        paginator = CountedPaginator(
+            Post.objects.all(), 10, count=counters.total_count)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 1)
+
+    def test_recount_feeds_fixes_drift(self):
+        """Команда recount_feeds исправляет разошедшиеся счётчики."""
+        counters.total_count()
+        counters.author_count(self.user_author.pk)
+        FeedCounter.objects.update(value=100)
+        call_command('recount_feeds', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.counter(counters.ALL), 1)
+        self.assertEqual(
+            self.counter(counters.author_key(self.user_author.pk)), 1)
+
+
+@override_settings(POSTS_ON_THE_PAGE_NUM=1)
+class ElidedPageRangeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.small_group = Group.objects.create(
+            title='Маленькая группа',
+            slug='small-slug',
+        )
+        cls.large_group = Group.objects.create(
+            title='Большая группа',
+            slug='large-slug',
+        )
+        for group, posts_num in ((cls.small_group, 30),
+                                 (cls.large_group, 3000)):
+            Post.objects.bulk_create([
+                Post(author=cls.user_author, group=group, text='Пост')
+                for _ in range(posts_num)
+            ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_elided_page_range(self):
+        """Окно страниц: края, соседи текущей страницы и пропуски."""
+        paginator = CountedPaginator(range(100), 1)
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(list(paginator.get_elided_page_range(50)),
+                         [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100])
+        self.assertEqual(list(paginator.get_elided_page_range(1)),
+                         [1, 2, 3, ellipsis, 100])
+        self.assertEqual(list(CountedPaginator(range(4), 1)
+                              .get_elided_page_range(2)), [1, 2, 3, 4])
+
+    def test_response_size_does_not_grow_with_posts(self):
+        """Размер страницы ленты не растёт с числом постов в ней."""
+        sizes = []
+        for group in (self.small_group, self.large_group):
+            response = self.guest_client.get(
+                reverse('posts:group_list', kwargs={'slug': group.slug}),
+                {'page': 15})
+            self.assertEqual(response.content.count(b'page-link'), 13)
+            sizes.append(len(response.content))
+        self.assertLess(abs(sizes[1] - sizes[0]), 200)
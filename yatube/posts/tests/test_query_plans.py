@@ -0,0 +1,124 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса: "SCAN posts_post" или
+# "SCAN TABLE posts_post" в старых версиях SQLite.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент не должны читать таблицы целиком и сортировать
+    результат во временном B-дереве."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'TestUser{num}')
+            for num in range(10)
+        ]
+        cls.user = cls.users[0]
+        cls.groups = [
+            Group.objects.create(title=f'Группа {num}', slug=f'slug-{num}')
+            for num in range(5)
+        ]
+        Post.objects.bulk_create([
+            Post(author=cls.users[num % 10], group=cls.groups[num % 5],
+                 text=f'Тестовый пост {num}')
+            for num in range(500)
+        ])
+        cls.post = Post.objects.filter(author=cls.users[1]).first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.users[num % 10],
+                    text=f'Комментарий {num}')
+            for num in range(50)
+        ])
+        for author in cls.users[1:6]:
+            Follow.objects.create(user=cls.user, author=author)
+        # Один подтягиваемый автор, чтобы проверить и запросы MergedFeed.
+        with override_settings(FEED_PULL_THRESHOLD=1):
+            timeline.classify(cls.users[5].pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            # Запрос логируется с подставленными параметрами, поэтому
+            # его можно выполнить как есть.
+            for step in self.plan(sql, ()):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotRegex(step, FULL_SCAN)
+                    self.assertNotIn(TEMP_SORT, step)
+        return response
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент и страницы поста идут по индексам."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=20',
+            reverse('posts:group_list', kwargs={'slug': 'slug-1'}),
+            reverse('posts:group_list', kwargs={'slug': 'slug-1'})
+            + '?page=5',
+            reverse('posts:profile',
+                    kwargs={'username': self.users[1].username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?page=10',
+        )
+        for url in urls:
+            self.assert_plans_use_indexes(url)
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_cursor_pages_use_indexes(self):
+        """Переходы по курсору вперёд и назад идут по индексам."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug-1'}),
+            reverse('posts:profile',
+                    kwargs={'username': self.users[1].username}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            page_obj = self.assert_plans_use_indexes(url).context['page_obj']
+            page_obj = self.assert_plans_use_indexes(
+                f'{url}?cursor={page_obj.next_cursor}').context['page_obj']
+            self.assert_plans_use_indexes(
+                f'{url}?cursor={page_obj.previous_cursor}')
+
+    @override_settings(COMMENTS_ON_THE_PAGE_NUM=10)
+    def test_comment_batches_use_indexes(self):
+        """Пачки комментариев в обоих порядках идут по индексу."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        fragment = reverse('posts:post_comments',
+                           kwargs={'post_id': self.post.pk})
+        for newest_first in (False, True):
+            with self.settings(COMMENTS_NEWEST_FIRST=newest_first):
+                comments = self.assert_plans_use_indexes(
+                    detail).context['comments']
+                self.assert_plans_use_indexes(
+                    f'{fragment}?cursor={comments.next_cursor}')
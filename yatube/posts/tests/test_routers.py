@@ -0,0 +1,138 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import PRIMARY_COOKIE
+
+from ..caching import tiers
+from ..models import Comment, FeedCounter, Post, ProfileStats
+
+User = get_user_model()
+
+REPLICA = 'replica'
+
+
+class LaggingReplica:
+    """Реплика в отдельном файле SQLite, которая получает данные
+    основной базы только при catch_up(): до этого она отстаёт."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.directory, 'replica.sqlite3')
+        connections.databases[alias] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.path}
+        connections.ensure_defaults(alias)
+        connections.prepare_test_settings(alias)
+
+    def catch_up(self):
+        connections[self.alias].close()
+        primary = connections['default']
+        primary.ensure_connection()
+        with sqlite3.connect(self.path) as replica:
+            primary.connection.backup(replica)
+
+    def remove(self):
+        connections[self.alias].close()
+        del connections.databases[self.alias]
+        delattr(connections._connections, self.alias)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+        self.replica = LaggingReplica(REPLICA)
+        self.addCleanup(self.replica.remove)
+        self.replica.catch_up()
+        self.user_author = User.objects.create_user(username='TestAuthor')
+        self.user_reader = User.objects.create_user(username='TestReader')
+        self.post = Post.objects.create(author=self.user_author,
+                                        text='Тестовый пост')
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.user_reader)
+        self.replica.catch_up()
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        """Чтения видят данные реплики, пока она не догонит основную
+        базу; внутри транзакции чтения идут в основную базу."""
+        Post.objects.create(author=self.user_author, text='Новый пост')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Post.objects.using('default').count(), 2)
+        with transaction.atomic():
+            self.assertEqual(Post.objects.count(), 2)
+        self.replica.catch_up()
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_writer_reads_own_writes(self):
+        """После комментария его автор видит его сразу, остальные —
+        после того, как реплика догонит основную базу."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Свежий комментарий'})
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertEqual(Comment.objects.using('default').count(), 1)
+        self.assertContains(self.reader_client.get(url), 'Свежий комментарий')
+        self.assertNotContains(self.author_client.get(url),
+                               'Свежий комментарий')
+        self.replica.catch_up()
+        self.assertContains(self.author_client.get(url),
+                            'Свежий комментарий')
+
+    def test_follow_pins_reads_to_primary(self):
+        """Подписка (GET-запрос с записью) тоже закрепляет чтения за
+        основной базой, а просто чтение — нет."""
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+        response = self.reader_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': 'TestAuthor'}))
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_lazy_fills_do_not_pin_reader(self):
+        """Счётчики, которые страница досчитывает при чтении, пишутся в
+        основную базу, но читателя к ней не привязывают."""
+        ProfileStats.objects.all().delete()
+        self.replica.catch_up()
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+        self.assertTrue(FeedCounter.objects.using('default').exists())
+        self.assertTrue(ProfileStats.objects.using('default').filter(
+            user=self.user_author).exists())
+
+    def test_pin_expires(self):
+        """По истечении срока из cookie чтения снова идут в реплику."""
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Свежий комментарий'})
+        self.reader_client.cookies[PRIMARY_COOKIE] = str(time.time() - 1)
+        response = self.reader_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertNotContains(response, 'Свежий комментарий')
+
+    def test_cached_objects_come_from_primary(self):
+        """Кэш объектов не наполняется отставшими данными реплики."""
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Отредактированный пост'})
+        response = self.reader_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, 'Отредактированный пост')
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..caching import tiers
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+def found(query, per_page=10, **kwargs):
+    return [card.text for card in search.find(query, per_page, **kwargs)]
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.user_other = User.objects.create_user(username='TestOther')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test-slug')
+        cls.rare = Post.objects.create(
+            author=cls.user_author, group=cls.group,
+            text='Коты спят, коты едят, коты мурлычут')
+        cls.frequent = Post.objects.create(
+            author=cls.user_other, text='Про котов и собак')
+        Post.objects.create(author=cls.user_other, text='Только собаки')
+
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+
+    def test_index_follows_writes(self):
+        """Индекс видит новые, изменённые, удалённые посты и
+        bulk_create."""
+        post = Post.objects.create(author=self.user_author,
+                                   text='Жирафы')
+        Post.objects.bulk_create([
+            Post(author=self.user_author, text='Жирафы в саванне')])
+        self.assertEqual(len(found('жираф')), 2)
+        post.text = 'Слоны'
+        post.save()
+        self.assertEqual(found('жираф'), ['Жирафы в саванне'])
+        self.assertEqual(found('слоны'), ['Слоны'])
+        post.delete()
+        self.assertEqual(found('слоны'), [])
+
+    def test_ranking_prefixes_and_case(self):
+        """Слова ищутся по префиксу без учёта регистра, пост с частым
+        словом выше."""
+        self.assertEqual(found('КОТ'), [self.rare.text, self.frequent.text])
+        self.assertEqual(found('кот собак'), [self.frequent.text])
+        self.assertEqual(found('"кот* собак)'),
+                         [self.frequent.text])
+        self.assertEqual(found('!!!'), [])
+
+    def test_filters(self):
+        """Фильтры по автору и группе."""
+        self.assertEqual(found('кот', author_id=self.user_other.pk),
+                         [self.frequent.text])
+        self.assertEqual(found('кот', group_id=self.group.pk),
+                         [self.rare.text])
+
+    def test_keyset_pagination(self):
+        """Курсоры обходят все результаты без повторов, плохой курсор
+        ведёт на первую страницу."""
+        Post.objects.bulk_create([
+            Post(author=self.user_author, text=f'Собака номер {num}')
+            for num in range(5)
+        ])
+        seen = []
+        cursor = None
+        while True:
+            page = search.find('собак', 2, cursor=cursor)
+            seen.extend(card.id for card in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        page = search.find('собак', 2, cursor='мусор')
+        self.assertFalse(page.has_previous())
+        self.assertEqual([card.id for card in page], seen[:2])
+
+    def test_search_page(self):
+        """Страница поиска выводит карточки найденных постов и ссылку на
+        следующую страницу с тем же запросом."""
+        url = reverse('posts:search')
+        response = Client().get(url, {'q': 'кот', 'group': 'test-slug'})
+        self.assertEqual(list(response.context['page_obj']), [self.rare])
+        self.assertContains(response, 'Коты спят')
+        with self.settings(POSTS_ON_THE_PAGE_NUM=1):
+            response = Client().get(url, {'q': 'кот'})
+        page = response.context['page_obj']
+        self.assertContains(
+            response, f'q=%D0%BA%D0%BE%D1%82&cursor={page.next_cursor}')
+        response = Client().get(url, {'q': 'кот', 'author': 'nobody'})
+        self.assertIsNone(response.context['page_obj'])
+        self.assertIn('author', response.context['form'].errors)
+        response = Client().get(url)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт по индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'кот'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.rare.pk, self.frequent.pk})
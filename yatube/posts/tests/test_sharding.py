@@ -0,0 +1,291 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connections, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import counters, images, search, sharding
+from ..caching import tiers
+from ..models import Comment, FeedCounter, Follow, Group, Post
+from .test_images import GIF
+
+User = get_user_model()
+
+SHARDS = ['shard_a', 'shard_b']
+
+
+def add_sqlite_database(alias, path):
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    connections.ensure_defaults(alias)
+    connections.prepare_test_settings(alias)
+
+
+def remove_database(alias):
+    connections[alias].close()
+    del connections.databases[alias]
+    delattr(connections._connections, alias)
+
+
+class ShardedTestCase(TransactionTestCase):
+    """Шарды — отдельные файлы SQLite с полной схемой, которые создаются
+    один раз на класс и очищаются после каждого теста."""
+
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        for alias in SHARDS:
+            add_sqlite_database(alias,
+                                os.path.join(cls.directory, f'{alias}.db'))
+            call_command('migrate', database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in SHARDS:
+            remove_database(alias)
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        tiers.clear()
+
+    def author_on(self, shard, prefix='author'):
+        """Пользователь, посты которого попадают в shard."""
+        for num in range(1000):
+            user = User.objects.create_user(username=f'{prefix}{num}')
+            if sharding.shard_for(user.pk) == shard:
+                return user
+            user.delete()
+        raise AssertionError('не нашлось автора для шарда')
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class ShardingTests(ShardedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = Group.objects.create(title='Тестовая группа',
+                                          slug='test-slug')
+        self.author_a = self.author_on('shard_a', 'a')
+        self.author_b = self.author_on('shard_b', 'b')
+        self.reader = User.objects.create_user(username='TestReader')
+        self.post_a = Post.objects.create(author=self.author_a,
+                                          group=self.group, text='Пост A')
+        self.post_b = Post.objects.create(author=self.author_b,
+                                          group=self.group, text='Пост B')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_rows_placed_by_author(self):
+        """Посты лежат в шарде автора, комментарии — в шарде поста,
+        ключи не пересекаются, пользователи и группы копируются."""
+        comment = Comment.objects.create(post=self.post_a,
+                                         author=self.author_b,
+                                         text='Комментарий')
+        self.assertEqual(Post.objects.using('shard_a').get().text, 'Пост A')
+        self.assertEqual(Post.objects.using('shard_b').get().text, 'Пост B')
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertEqual(
+            Comment.objects.using('shard_a').get().pk, comment.pk)
+        self.assertEqual(len({self.post_a.pk, self.post_b.pk, comment.pk}),
+                         3)
+        self.assertEqual(
+            Post.objects.using('shard_a').get().comment_count, 1)
+        for alias in SHARDS:
+            self.assertEqual(User.objects.using(alias).count(), 3)
+            self.assertTrue(Group.objects.using(alias).filter(
+                slug='test-slug').exists())
+
+    def test_profile_and_post_detail_read_one_shard(self):
+        """Профиль и страница поста находят данные в шарде автора."""
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post_b.pk}),
+            data={'text': 'Комментарий читателя'})
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': self.author_a}))
+        self.assertEqual(list(response.context['page_obj']), [self.post_a])
+        response = self.reader_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post_b.pk}))
+        self.assertEqual(response.context['post'].text, 'Пост B')
+        self.assertContains(response, 'Комментарий читателя')
+
+    def test_feeds_merge_shards_by_pub_date(self):
+        """Главная, группа и лента подписок собираются из всех шардов
+        в порядке публикации."""
+        newest = Post.objects.create(author=self.author_a, text='Новый A')
+        Follow.objects.create(user=self.reader, author=self.author_a)
+        Follow.objects.create(user=self.reader, author=self.author_b)
+        expected = [newest, self.post_b, self.post_a]
+        urls = (
+            (reverse('posts:index'), expected),
+            (reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+             [self.post_b, self.post_a]),
+            (reverse('posts:follow_index'), expected),
+        )
+        for url, posts in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(list(response.context['page_obj']), posts)
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, len(posts))
+
+    def test_edit_and_delete_stay_in_shard(self):
+        """Правка поста пишет в его шард, удаление автора удаляет его
+        посты из шарда."""
+        author_client = Client()
+        author_client.force_login(self.author_b)
+        author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post_b.pk}),
+            data={'text': 'Отредактированный пост'})
+        self.assertEqual(Post.objects.using('shard_b').get().text,
+                         'Отредактированный пост')
+        self.author_b.delete()
+        self.assertFalse(Post.objects.using('shard_b').exists())
+        self.assertFalse(User.objects.using('shard_b').filter(
+            pk=self.author_b.pk).exists())
+
+    def test_page_read_before_commit_is_not_kept(self):
+        """Страница, которую другой запрос построил между записью поста и
+        фиксацией транзакции, не отдаётся после фиксации."""
+        pages = []
+
+        def read():
+            try:
+                pages.append(Client().get(reverse('posts:index')))
+            finally:
+                connections.close_all()
+
+        with transaction.atomic(using='shard_a'):
+            Post.objects.create(author=self.author_a, text='Новый A')
+            # Шарды в режиме WAL: соседнее соединение читает данные
+            # до фиксации.
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join()
+        self.assertNotContains(pages[0], 'Новый A')
+        self.assertContains(Client().get(reverse('posts:index')), 'Новый A')
+
+    def test_page_built_before_thumbnail_is_not_kept(self):
+        """Страница, построенная между фиксацией поста и его миниатюрой,
+        не отдаётся после того, как миниатюра построена."""
+        url = reverse('posts:index')
+        refresh = images.refresh
+
+        def refresh_later(post, using):
+            Client().get(url)
+            refresh(post, using)
+
+        author_client = Client()
+        author_client.force_login(self.author_a)
+        image = SimpleUploadedFile('late.gif', GIF, content_type='image/gif')
+        with override_settings(MEDIA_ROOT=self.directory), \
+                mock.patch.object(images, 'refresh',
+                                  side_effect=refresh_later):
+            author_client.post(reverse('posts:post_create'),
+                               data={'text': 'Пост с картинкой',
+                                     'image': image})
+        post = Post.objects.using('shard_a').get(text='Пост с картинкой')
+        self.assertTrue(post.thumbnail_srcset)
+        self.assertContains(Client().get(url),
+                            f'srcset="{post.thumbnail_srcset}"')
+
+    def test_failed_counter_write_rolls_back_shard_row(self):
+        """Ошибка при записи счётчиков в default откатывает и пост в
+        шарде."""
+        author_client = Client()
+        author_client.force_login(self.author_a)
+        before = counters.author_count(self.author_a.pk)
+        with mock.patch.object(counters, 'add',
+                               side_effect=RuntimeError('default упала')):
+            with self.assertRaises(RuntimeError):
+                author_client.post(reverse('posts:post_create'),
+                                   data={'text': 'Пост без счётчика'})
+        self.assertFalse(Post.objects.using('shard_a').filter(
+            text='Пост без счётчика').exists())
+        self.assertEqual(counters.author_count(self.author_a.pk), before)
+
+    def test_recount_feeds_counts_all_shards(self):
+        """recount_feeds считает посты во всех шардах, а группу — суммой
+        по шардам."""
+        counters.total_count()
+        counters.group_count(self.group.pk)
+        counters.author_count(self.author_a.pk)
+        FeedCounter.objects.update(value=7)
+        call_command('recount_feeds', chunk_size=1, stdout=StringIO())
+        self.assertEqual(counters.total_count(), 2)
+        self.assertEqual(counters.group_count(self.group.pk), 2)
+        self.assertEqual(counters.author_count(self.author_a.pk), 1)
+
+    def test_recount_stats_fixes_comment_counts_in_shards(self):
+        """recount_stats исправляет число комментариев постов в их
+        шардах."""
+        Comment.objects.create(post=self.post_b, author=self.author_a,
+                               text='Комментарий')
+        for shard in SHARDS:
+            Post.objects.using(shard).update(comment_count=7)
+        call_command('recount_stats', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            Post.objects.using('shard_a').get().comment_count, 0)
+        self.assertEqual(
+            Post.objects.using('shard_b').get().comment_count, 1)
+
+    def test_search_merges_shards(self):
+        """Поиск находит посты во всех шардах, а с автором — в его."""
+        self.assertEqual(list(search.find('пост', 10)),
+                         [self.post_b, self.post_a])
+        self.assertEqual(
+            list(search.find('пост', 10, author_id=self.author_a.pk)),
+            [self.post_a])
+
+    def test_rendezvous_hashing_moves_few_authors(self):
+        """Новый шард забирает авторов только себе."""
+        for author_id in range(1, 200):
+            before = sharding.shard_for(author_id, SHARDS)
+            after = sharding.shard_for(author_id, SHARDS + ['shard_c'])
+            self.assertIn(after, (before, 'shard_c'))
+
+
+class RebalanceTests(ShardedTestCase):
+    def test_existing_data_moves_to_author_shards(self):
+        """Команда переносит посты с комментариями из default в шарды,
+        сохраняя ключи, и новые ключи не совпадают со старыми."""
+        with override_settings(POST_SHARDS=SHARDS):
+            author_a = self.author_on('shard_a', 'a')
+            author_b = self.author_on('shard_b', 'b')
+        post_a = Post.objects.create(author=author_a, text='Пост A')
+        post_b = Post.objects.create(author=author_b, text='Пост B')
+        comment = Comment.objects.create(post=post_a, author=author_b,
+                                         text='Комментарий')
+        self.assertTrue(Post.objects.using('default').exists())
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command('rebalance_shards', stdout=StringIO())
+            self.assertFalse(Post.objects.using('default').exists())
+            self.assertEqual(Post.objects.using('shard_a').get().pk,
+                             post_a.pk)
+            self.assertEqual(Post.objects.using('shard_b').get().pk,
+                             post_b.pk)
+            self.assertEqual(Comment.objects.using('shard_a').get().pk,
+                             comment.pk)
+            new_post = Post.objects.create(author=author_b, text='Новый')
+            self.assertGreater(new_post.pk, comment.pk)
+            response = Client().get(reverse('posts:index'))
+            self.assertEqual(list(response.context['page_obj']),
+                             [new_post, post_b, post_a])
+
+    def test_disabled_sharding(self):
+        """Без POST_SHARDS команде некуда переносить посты."""
+        with self.assertRaises(CommandError):
+            call_command('rebalance_shards')
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from core.db import configure_sqlite, pragmas
+
+
+class SQLitePragmaTests(SimpleTestCase):
+    databases = {'default'}
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connections(self):
+        """Прагмы из SQLITE_PRAGMAS выполняются для соединения."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1000,
+                                       'cache_size': -1024})
+    def test_database_overrides(self):
+        """Ключ PRAGMAS базы переопределяет общие значения, None
+        отключает прагму."""
+        self.addCleanup(configure_sqlite, None, connection)
+        with mock.patch.dict(connection.settings_dict,
+                             {'PRAGMAS': {'busy_timeout': 250,
+                                          'cache_size': None}}):
+            self.assertEqual(pragmas(connection), {'busy_timeout': 250})
+            configure_sqlite(None, connection)
+        self.assertEqual(self.pragma('busy_timeout'), 250)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout; DROP': 1})
+    def test_invalid_pragma_name(self):
+        """Имя прагмы подставляется в SQL, поэтому проверяется."""
+        with self.assertRaises(ValueError):
+            configure_sqlite(None, connection)
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters, stats
+from ..models import Comment, Follow, Group, Post, ProfileStats
+
+User = get_user_model()
+
+
+class StatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.user_follower = User.objects.create_user(username='TestFollower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user_author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(StatsTests.user_follower)
+
+    def stats(self, user):
+        return ProfileStats.objects.get(user=user)
+
+    def test_post_create_updates_counters(self):
+        """Новый пост увеличивает счётчики автора и группы."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новый пост', 'group': self.group.pk},
+        )
+        self.assertEqual(counters.group_count(self.group.pk), 2)
+        self.assertEqual(stats.for_user(self.user_follower.pk).post_count, 1)
+
+    def test_add_comment_updates_comment_count(self):
+        """Комментарий увеличивает счётчик поста, удаление уменьшает."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Тестовый комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        Comment.objects.all().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_follow_and_unfollow_update_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        kwargs = {'username': self.user_author.username}
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs=kwargs))
+        self.assertEqual(self.stats(self.user_author).follower_count, 1)
+        self.assertEqual(self.stats(self.user_follower).following_count, 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs=kwargs))
+        self.assertEqual(self.stats(self.user_author).follower_count, 0)
+        self.assertEqual(self.stats(self.user_follower).following_count, 0)
+
+    def test_post_delete_updates_counters(self):
+        """Удаление поста уменьшает счётчики автора и группы."""
+        self.post.delete()
+        self.assertEqual(counters.group_count(self.group.pk), 0)
+        self.assertEqual(stats.for_user(self.user_author.pk).post_count, 0)
+
+    def test_recount_stats_fixes_drift(self):
+        """Команда recount_stats восстанавливает разошедшиеся счётчики."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_author)
+        ProfileStats.objects.update(follower_count=7)
+        ProfileStats.objects.filter(user=self.user_follower).delete()
+        Post.objects.update(comment_count=7)
+        call_command('recount_stats', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.stats(self.user_author).follower_count, 1)
+        self.assertEqual(self.stats(self.user_follower).following_count, 1)
+        self.assertEqual(Post.objects.get().comment_count, 0)
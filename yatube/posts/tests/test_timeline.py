@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, PulledAuthor, TimelineEntry
+from ..paginator import CursorPaginator
+from ..timeline import MergedFeed, follow_feed
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.user_follower = User.objects.create_user(username='TestFollower')
+        cls.post = Post.objects.create(
+            author=cls.user_author,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTests.user_follower)
+
+    def timeline_posts(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.user_follower).values_list('post', flat=True))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит в ленту уже опубликованные посты автора."""
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_author.username}))
+        self.assertEqual(self.timeline_posts(), [self.post.pk])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика, в том числе
+        при bulk_create."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_author)
+        post = Post.objects.create(author=self.user_author, text='Новый')
+        Post.objects.bulk_create([
+            Post(author=self.user_author, text='Пачка')])
+        bulk_post = Post.objects.get(text='Пачка')
+        self.assertCountEqual(self.timeline_posts(),
+                              [self.post.pk, post.pk, bulk_post.pk])
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка удаляет посты автора из ленты."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_author.username}))
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_follow_index_reads_timeline(self):
+        """Лента подписок строится по материализованной ленте."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_author)
+        TimelineEntry.objects.filter(user=self.user_follower).delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает потерянные записи."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), [self.post.pk])
+
+
+@override_settings(FEED_PULL_THRESHOLD=2)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_star = User.objects.create_user(username='TestStar')
+        cls.user_author = User.objects.create_user(username='TestAuthor')
+        cls.user_follower = User.objects.create_user(username='TestFollower')
+        cls.user_fan = User.objects.create_user(username='TestFan')
+        for num in range(3):
+            Post.objects.create(author=cls.user_star, text=f'Звезда {num}')
+            Post.objects.create(author=cls.user_author, text=f'Автор {num}')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_author)
+        Follow.objects.create(user=self.user_follower, author=self.user_star)
+        Follow.objects.create(user=self.user_fan, author=self.user_star)
+
+    def test_author_over_threshold_is_pulled(self):
+        """Автор, набравший порог подписчиков, перестаёт рассылаться
+        по лентам, а его новые посты туда не попадают."""
+        self.assertTrue(
+            PulledAuthor.objects.filter(author=self.user_star).exists())
+        Post.objects.create(author=self.user_star, text='Новый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.user_star).exists())
+
+    def test_follow_feed_merges_pulled_posts(self):
+        """Лента подписок сливает материализованные и подтянутые посты
+        в общем порядке Post.Meta.ordering."""
+        feed = follow_feed(self.user_follower)
+        self.assertIsInstance(feed, MergedFeed)
+        expected = list(Post.objects.filter(
+            author__in=[self.user_star, self.user_author]))
+        self.assertEqual(feed.count(), len(expected))
+        self.assertEqual(list(feed), expected)
+        self.assertEqual(feed[2:5], expected[2:5])
+
+    def test_follow_index_pages_merged_feed(self):
+        """Страница подписок показывает посты обоих авторов."""
+        client = Client()
+        client.force_login(self.user_follower)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         list(Post.objects.all()))
+
+    def test_merged_feed_supports_cursor_pagination(self):
+        """Курсорная пагинация проходит слитую ленту без повторов."""
+        paginator = CursorPaginator(follow_feed(self.user_follower), 4)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(first) + list(second), list(Post.objects.all()))
+        self.assertEqual(list(paginator.get_page(second.previous_cursor)),
+                         list(first))
+
+    def test_author_under_threshold_is_pushed_again(self):
+        """После отписки автор возвращается к рассылке, а ленты
+        оставшихся подписчиков заполняются его постами."""
+        Follow.objects.get(user=self.user_fan, author=self.user_star).delete()
+        self.assertFalse(
+            PulledAuthor.objects.filter(author=self.user_star).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user_follower,
+                                         author=self.user_star).count(),
+            self.user_star.posts.count())
@@ -1,6 +1,7 @@
 import math
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -92,7 +93,7 @@ class PostPagesTests(TestCase):
         """Все посты формируются с ожидаемыми полями."""
         self.assertEqual(post.author.username, self.post.author.username)
         self.assertEqual(post.pub_date, self.post.pub_date)
-        self.assertEqual(post.group.title, self.post.group.title)
+        self.assertEqual(post.group.slug, self.post.group.slug)
         self.assertEqual(post.text, self.post.text)
         self.assertEqual(post.image, self.post.image)
 
@@ -162,7 +163,9 @@ class PostPagesTests(TestCase):
         """Проверка кэширования главной страницы."""
         response = self.guest_client.get(reverse('posts:index'))
         page_content = response.content
-        Post.objects.first().delete()
+        # update() не вызывает сигналы, поэтому поколение ленты
+        # не меняется и страница отдаётся из кэша.
+        Post.objects.update(text='Изменённый пост')
         response = self.guest_client.get(reverse('posts:index'))
         cached_page_content = response.content
         cache.clear()
@@ -171,6 +174,83 @@ class PostPagesTests(TestCase):
         self.assertEqual(page_content, cached_page_content)
         self.assertNotEqual(cached_page_content, cleared_page_content)
 
+    def test_post_cards_are_cached_until_edit(self):
+        """Карточки постов берутся из кэша фрагментов, а правка поста
+        меняет их версию."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        with mock.patch('posts.templatetags.post_cards.render_to_string',
+                        side_effect=AssertionError('карточка не из кэша')):
+            response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.text)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Отредактированный пост'},
+        )
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Отредактированный пост')
+
+    def test_post_cards_rerendered_after_author_rename(self):
+        """Смена имени автора меняет версию его карточек, а вход
+        пользователя — нет."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.user_author.last_login = timezone.now()
+        self.user_author.save(update_fields=['last_login'])
+        with mock.patch('posts.templatetags.post_cards.render_to_string',
+                        side_effect=AssertionError('карточка не из кэша')):
+            self.authorized_client.get(url)
+        self.user_author.first_name = 'Новое'
+        self.user_author.last_name = 'Имя'
+        self.user_author.save()
+        self.assertContains(self.authorized_client.get(url), 'Новое Имя')
+
+    def test_author_rename_refreshes_cached_pages(self):
+        """Новое имя автора видно гостям на всех страницах с его
+        постами."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user_author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        self.user_author.first_name = 'Новое'
+        self.user_author.last_name = 'Имя'
+        self.user_author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новое Имя')
+
+    def test_page_cache_invalidated_by_writes(self):
+        """Кэш страниц для гостей сбрасывается записью постов,
+        комментариев и подписок, от которых зависит страница."""
+        author = self.post.author.username
+        urls_writes = (
+            (reverse('posts:index'),
+             lambda: Post.objects.create(author=self.user_author,
+                                         text='Новый пост')),
+            (reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+             lambda: Post.objects.create(author=self.user_follower,
+                                         group=self.group,
+                                         text='Пост в группе')),
+            (reverse('posts:profile', kwargs={'username': author}),
+             lambda: Follow.objects.filter(
+                 user=self.user_follower).delete()),
+            (reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+             lambda: self.post.comments.create(author=self.user_follower,
+                                               text='Комментарий')),
+        )
+        for url, write in urls_writes:
+            with self.subTest(url=url):
+                before = self.guest_client.get(url).content
+                self.assertEqual(self.guest_client.get(url).content, before)
+                write()
+                self.assertNotEqual(self.guest_client.get(url).content,
+                                    before)
+
 
 class FollowViewsTests(TestCase):
     @classmethod
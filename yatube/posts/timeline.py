@@ -0,0 +1,187 @@
+"""Лента подписок: гибрид fan-out on write и подтягивания при чтении.
+
+Запись в ``TimelineEntry`` делают триггеры базы из миграций
+``0022_timeline_triggers`` и ``0024_timeline_skip_pulled_authors``: новый
+пост автора копируется в ленты всех его подписчиков, подписка переносит
+в ленту все посты автора, отписка удаляет их.
+
+Авторы, у которых подписчиков не меньше ``settings.FEED_PULL_THRESHOLD``,
+попадают в ``PulledAuthor``: их посты по лентам не рассылаются, а при
+чтении подтягиваются отдельными запросами и сливаются с материализованной
+лентой k-way слиянием на куче.
+"""
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Follow, Post, PulledAuthor, TimelineEntry
+
+# Автор возвращается к рассылке, только когда подписчиков стало заметно
+# меньше порога, иначе отписка и подписка на границе гоняли бы его ленту
+# туда и обратно.
+DEMOTE_RATIO = 0.9
+
+# Ключ сортировки ленты подписок. Для материализованной части это колонки
+# TimelineEntry, для подтягиваемых авторов колонки самого поста, поэтому
+# все потоки сливаются и листаются курсором по одним и тем же именам.
+FEED_ORDERING = ('-feed_date', '-feed_id')
+
+REBUILD_SQL = """
+    INSERT INTO {timeline} (user_id, post_id, author_id, pub_date)
+    SELECT f.user_id, p.id, p.author_id, p.pub_date
+    FROM {follow} f JOIN {post} p ON p.author_id = f.author_id
+    WHERE f.user_id IN ({placeholders})
+      AND f.author_id NOT IN (SELECT author_id FROM {pulled})
+"""
+
+FAN_OUT_SQL = """
+    INSERT OR IGNORE INTO {timeline} (user_id, post_id, author_id, pub_date)
+    SELECT f.user_id, p.id, p.author_id, p.pub_date
+    FROM {follow} f JOIN {post} p ON p.author_id = f.author_id
+    WHERE f.author_id = %s
+"""
+
+
+class MergedFeed:
+    """Ленивое слияние нескольких отсортированных querysets постов.
+
+    Поддерживает то, что нужно Paginator и CursorPaginator: count(),
+    срезы, filter() и order_by(). Для среза [start:stop] из каждого
+    потока берётся не больше stop записей.
+    """
+
+    ordered = True
+    model = Post
+
+    def __init__(self, streams, ordering=Post._meta.ordering):
+        self.streams = list(streams)
+        self.ordering = tuple(ordering)
+        self._key = attrgetter(*(name.lstrip('-') for name in self.ordering))
+        self._reverse = self.ordering[0].startswith('-')
+
+    def _clone(self, method, *args, **kwargs):
+        return MergedFeed(
+            [getattr(stream, method)(*args, **kwargs)
+             for stream in self.streams],
+            self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self._clone('select_related', *fields)
+
+    def order_by(self, *ordering):
+        feed = self._clone('order_by', *ordering)
+        return MergedFeed(feed.streams, ordering)
+
+    @property
+    def query(self):
+        # По нему CursorPaginator узнаёт типы полей-аннотаций.
+        return self.streams[0].query
+
+    def count(self):
+        return sum(stream.count() for stream in self.streams)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return heapq.merge(*self.streams, key=self._key,
+                           reverse=self._reverse)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            return list(islice(iter(self), start, None))
+        merged = heapq.merge(*(stream[:stop] for stream in self.streams),
+                             key=self._key, reverse=self._reverse)
+        return list(islice(merged, start, stop))
+
+
+def follow_feed(user):
+    """Лента подписок пользователя, новые посты первыми.
+
+    Материализованная часть сортируется по колонкам записи ленты,
+    вынесенным в аннотации FEED_ORDERING, поэтому SQLite обходит индекс
+    (user, pub_date, post) и подтягивает посты по первичному ключу; условия
+    курсора на аннотации не добавляют второго соединения с TimelineEntry.
+    Если пользователь подписан на авторов из PulledAuthor, их посты
+    сливаются с лентой через MergedFeed.
+    """
+    pushed = Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_id=F('timeline_entries__post_id'),
+    ).order_by(*FEED_ORDERING)
+    pulled_ids = list(Follow.objects.filter(
+        user=user, author__pulled_feed__isnull=False
+    ).values_list('author_id', flat=True))
+    if not pulled_ids:
+        return pushed
+    return MergedFeed([pushed] + [
+        Post.objects.filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'), feed_id=F('id'),
+        ).order_by(*FEED_ORDERING)
+        for author_id in pulled_ids
+    ], FEED_ORDERING)
+
+
+def _execute(sql, params):
+    sql = sql.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+        pulled=PulledAuthor._meta.db_table,
+        placeholders=', '.join(['%s'] * len(params)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def classify(author_id, followers=None):
+    """Переводит автора между рассылкой и подтягиванием по числу
+    подписчиков. Возвращает True, если автор теперь подтягивается."""
+    if followers is None:
+        followers = Follow.objects.filter(author_id=author_id).count()
+    threshold = settings.FEED_PULL_THRESHOLD
+    pulled = PulledAuthor.objects.filter(author_id=author_id).exists()
+    with transaction.atomic():
+        if not pulled and followers >= threshold:
+            PulledAuthor.objects.create(author_id=author_id)
+            TimelineEntry.objects.filter(author_id=author_id).delete()
+            return True
+        if pulled and followers < threshold * DEMOTE_RATIO:
+            PulledAuthor.objects.filter(author_id=author_id).delete()
+            _execute(FAN_OUT_SQL, [author_id])
+            return False
+    return pulled
+
+
+def classify_authors():
+    """Пересчитывает классификацию всех авторов."""
+    followers = dict(
+        Follow.objects.order_by().values('author').annotate(
+            followers=Count('id')).values_list('author', 'followers'))
+    for author_id in set(followers) | set(
+            PulledAuthor.objects.values_list('author_id', flat=True)):
+        classify(author_id, followers.get(author_id, 0))
+
+
+def rebuild(user_ids):
+    """Пересобирает ленты указанных пользователей с нуля.
+
+    Возвращает число записанных строк.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+        return _execute(REBUILD_SQL, user_ids)
@@ -1,73 +1,149 @@
+from functools import partial
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from . import counters, images, object_cache, search, sharding, stats
+from .cards import feed_cards
+from .caching import (ALL, author_scope, cache_anonymous_page, depends_on,
+                      group_scope, post_scope)
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Follow, Post
+from .paginator import CountedPaginator, CursorPaginator
+
 
+def paginate(request, post_list, posts_on_the_page_num, count=None):
+    if settings.POSTS_PAGINATION_MODE == 'cursor':
+        paginator = CursorPaginator(post_list, posts_on_the_page_num)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = CountedPaginator(post_list, posts_on_the_page_num,
+                                 count=count)
+    return paginator.get_page(request.GET.get('page'))
 
-def paginate(page_number, post_list, posts_on_the_page_num):
-    paginator = Paginator(post_list, posts_on_the_page_num)
-    return paginator.get_page(page_number)
 
+def paginate_comments(post, cursor):
+    ordering = ('created', 'id')
+    if settings.COMMENTS_NEWEST_FIRST:
+        ordering = ('-created', '-id')
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                settings.COMMENTS_ON_THE_PAGE_NUM,
+                                ordering)
+    return paginator.get_page(cursor)
 
+
+@cache_anonymous_page
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('author', 'group')
+    depends_on(request, ALL)
+    post_list = feed_cards(sharding.posts(Post.objects.all()), (ALL,))
     context = {
-        'page_obj': paginate(request.GET.get('page'),
+        'page_obj': paginate(request,
                              post_list,
-                             settings.POSTS_ON_THE_PAGE_NUM),
+                             settings.POSTS_ON_THE_PAGE_NUM,
+                             counters.total_count),
     }
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
+    group = object_cache.get_group_or_404(slug)
+    depends_on(request, group_scope(group.pk))
+    post_list = feed_cards(sharding.posts(group.posts.all()),
+                           (group_scope(group.pk),))
     context = {
         'group': group,
-        'page_obj': paginate(request.GET.get('page'),
+        'page_obj': paginate(request,
                              post_list,
-                             settings.POSTS_ON_THE_PAGE_NUM),
+                             settings.POSTS_ON_THE_PAGE_NUM,
+                             partial(counters.group_count, group.pk)),
     }
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group')
+    author = object_cache.get_user_or_404(username)
+    depends_on(request, author_scope(author.pk))
+    post_list = feed_cards(author.posts.all(),
+                           (author_scope(author.pk),))
     following = (
         request.user.is_authenticated
         and author.following.filter(user=request.user).exists()
     )
     context = {
         'author': author,
+        'stats': stats.for_user(author.pk),
         'following': following,
-        'page_obj': paginate(request.GET.get('page'),
+        'page_obj': paginate(request,
                              post_list,
-                             settings.POSTS_ON_THE_PAGE_NUM),
+                             settings.POSTS_ON_THE_PAGE_NUM,
+                             partial(counters.author_count, author.pk)),
     }
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post.objects.select_related('author', 'group'),
-                             pk=post_id)
-    comments = post.comments.select_related('author')
+    depends_on(request, post_scope(post_id))
+    post = object_cache.get_post_or_404(post_id)
+    depends_on(request, author_scope(post.author_id))
+    images.resolve_thumbnails([post])
     context = {
         'post': post,
+        'author_stats': stats.for_user(post.author_id),
         'form': CommentForm(),
-        'comments': comments
+        'comments': paginate_comments(post, request.GET.get('comments')),
+    }
+    return render(request, template, context)
+
+
+@cache_anonymous_page
+def post_comments(request, post_id):
+    """Очередная пачка комментариев для кнопки «Показать ещё»."""
+    template = 'posts/includes/comments.html'
+    depends_on(request, post_scope(post_id))
+    post = object_cache.get_post_or_404(post_id)
+    context = {
+        'post': post,
+        'comments': paginate_comments(post, request.GET.get('cursor')),
+    }
+    return render(request, template, context)
+
+
+def post_search(request):
+    """Поиск по тексту постов (posts.search); страницы результатов
+    в кэш не кладутся."""
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        author = form.cleaned_data['author']
+        group = form.cleaned_data['group']
+        page_obj = search.find(
+            form.cleaned_data['q'],
+            settings.POSTS_ON_THE_PAGE_NUM,
+            author_id=author.pk if author else None,
+            group_id=group.pk if group else None,
+            cursor=request.GET.get('cursor'),
+        )
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query': query.urlencode(),
     }
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(
@@ -77,16 +153,17 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with sharding.atomic(post.author_id):
+            post.save()
         return redirect('posts:profile', request.user.username)
     return render(request, template, {'form': form})
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
-    post = get_object_or_404(Post.objects.select_related('author', 'group'),
-                             pk=post_id)
+    post = object_cache.get_post_or_404(post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post.pk)
     form = PostForm(
@@ -95,7 +172,11 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        # Пост мог прийти из кэша, поэтому сохраняются только поля формы:
+        # устаревшая копия не затрёт счётчик комментариев.
+        with sharding.atomic(post.author_id):
+            form.save(commit=False).save(
+                update_fields=PostForm.Meta.fields)
         return redirect('posts:post_detail', post.pk)
     context = {
         'form': form,
@@ -105,40 +186,44 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = object_cache.get_post_or_404(post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with sharding.atomic(post.author_id):
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.select_related('author', 'group').filter(
-        author__following__user=request.user)
+    post_list = feed_cards(sharding.follow_feed(request.user))
     context = {
-        'page_obj': paginate(request.GET.get('page'),
+        'page_obj': paginate(request,
                              post_list,
-                             settings.POSTS_ON_THE_PAGE_NUM),
+                             settings.POSTS_ON_THE_PAGE_NUM,
+                             partial(counters.follow_count, request.user)),
         'follow': True,
     }
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = object_cache.get_user_or_404(username)
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', author)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     follower = get_object_or_404(
         Follow,
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -91,6 +92,31 @@ DATABASES = {
     }
 }
 
+# Чтения из реплик, запись в default (см. core.routers). Реплики —
+# псевдонимы из DATABASES, которые наполняет внешняя репликация.
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.routers.PrimaryReplicaRouter',
+]
+DATABASE_REPLICAS = []
+# Псевдонимы баз из DATABASES, между которыми посты и комментарии
+# делятся по авторам (см. posts.sharding); пустой список — всё в default.
+POST_SHARDS = []
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_LAG_SECONDS = 5
+
+# Прагмы для каждого соединения SQLite (см. core.db). Значения для
+# отдельной базы задаются ключом 'PRAGMAS' в DATABASES.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,6 +164,16 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Self settings
 
 POSTS_ON_THE_PAGE_NUM: int = 10
+# 'pages' - нумерованные страницы, 'cursor' - переход по курсорам
+# (keyset), который не зависит от глубины страницы и не делает COUNT(*).
+POSTS_PAGINATION_MODE: str = 'pages'
+# С этого числа подписчиков посты автора не рассылаются по лентам
+# подписок, а подтягиваются при чтении ленты.
+FEED_PULL_THRESHOLD: int = 10_000
+# Комментарии на странице поста выводятся пачками по курсору; остальные
+# подгружаются кнопкой «Показать ещё».
+COMMENTS_ON_THE_PAGE_NUM: int = 20
+COMMENTS_NEWEST_FIRST: bool = False
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -148,8 +184,32 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.permission_denied'
 
+# LocMemCache у каждого процесса свой. При запуске в несколько процессов
+# (gunicorn -w N) нужен общий кэш, иначе сброс поколений и объектов
+# из posts.caching и posts.object_cache виден только одному процессу:
+# 'BACKEND': 'core.cache.SQLiteCache' с путём к файлу в 'LOCATION'.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Страницы для анонимных посетителей и карточки постов живут в кэше,
+# пока не изменятся их данные (см. posts.caching); срок нужен только
+# чтобы ограничить память.
+PAGE_CACHE_TIMEOUT = None
+# Сколько страниц и карточек держит LRU в памяти каждого процесса перед
+# общим кэшем (posts.caching.tiers).
+L1_CACHE_ENTRIES = 1000
+# Сколько секунд перестроение устаревшей страницы принадлежит одному
+# запросу, пока остальные отдают прежнюю версию (posts.caching.fetch).
+CACHE_LEASE_TIMEOUT = 10
+# Насколько заранее перестраиваются записи со сроком жизни: больше —
+# раньше (XFetch).
+CACHE_EARLY_RECOMPUTE_BETA = 1.0
+# Посты, группы и пользователи в кэше объектов (см. posts.object_cache).
+# Срок ограничивает устаревание после записей в обход сигналов.
+OBJECT_CACHE_TIMEOUT = 300
+# Метки отсутствующих постов, групп и пользователей: короткий срок, чтобы
+# не держать память под адреса, перебираемые сканерами.
+NEGATIVE_CACHE_TIMEOUT = 60